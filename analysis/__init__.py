@@ -1,2 +1,5 @@
-from .analyzer import Analyzer
-from .note_dist import NoteDistPlotter
\ No newline at end of file
+from .analyzer import DEFAULT_PEAK_WINDOWS, Analyzer, get_stat_columns
+from .chart_diff import ChartDiff
+from .note_dist import NoteDistPlotter
+from .score import ACCURACY_MODELS, AccuracyModel, simulate_scores
+from .stat_graph import STAT_GROUPS
@@ -1,15 +1,25 @@
 import json
 import math
 import os
-from collections import OrderedDict
 from enum import Enum
-from itertools import tee
-from typing import Any, Dict, List, Tuple, TypeVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TypeVar
 
-from mutagen.mp3 import MP3
-from mutagen.oggvorbis import OggVorbis
+import numpy as np
 
-from chart import Chart, EventType, LevelInfo, NoteType
+import bundle
+from chart import (Chart, EventArgs, EventColumns, EventType, LevelInfo,
+                   NoteColumns, NoteType, PageColumns, ScanLineDirection,
+                   TempoMap)
+from chart.level_info import ChartInfo
+
+from .density import peak_page_rate, peak_window
+from .drag_chains import get_chain_table
+from .movement import JUMP_PERCENTILE, get_movement_stats
+from .music import get_music_length
+from .score import (JUDGEMENTS, MAX_COMBO_SCORE, MAX_NOTE_SCORE, NOTE_SCORE,
+                    NOTE_TP)
+from .stat_graph import STAT_GROUPS, resolve_steps
+from .strain import get_strain_rating, get_strains
 
 EnumT = TypeVar("EnumT", bound=Enum)
 
@@ -20,6 +30,18 @@ NOTE_CATEGORIES: Dict[str, List[NoteType]] = {
 
 MINIMUM_GOOD_NOTES = [NoteType.tap, *NOTE_CATEGORIES["hold"], NoteType.cdrag_head]
 MINIMIUM_GREAT_NOTES = [NoteType.flick]
+DEFAULT_PEAK_WINDOWS = (1, 5, 10)
+PAGE_MIX_TYPES: Dict[str, List[NoteType]] = {
+    "tap": [NoteType.tap, NoteType.cdrag_head],
+    "hold": NOTE_CATEGORIES["hold"],
+    "flick": [NoteType.flick],
+    "drag": [NoteType.drag_head, *NOTE_CATEGORIES["drag_child"]],
+}
+PAGE_PERCENTILES = (50, 90, 99)
+SUBTOTAL_KEYS = ("hold", "drag_head", "drag_child", "cdrag", "drag",
+                 "total_drag")
+APPEND_TOTAL = ("hold", "drag_head", "drag_child")
+CHAIN_TYPES = {"drag": [NoteType.drag_head], "cdrag": [NoteType.cdrag_head]}
 
 def make_dict(enum: EnumT) -> Dict[EnumT, int]:
     return {item: 0 for item in enum}
@@ -28,55 +50,140 @@ def truncate(num: float, decimals: int) -> float:
     base = 10 ** decimals
     return math.floor(num * base) / base
 
+def get_stat_columns(peak_windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS
+                     ) -> Dict[str, List[str]]:
+    """
+        Lists the columns each stat group adds to get_stats_as_json, in the
+        order they're written. The note rates and peak densities count a hold
+        in every second, window or page it touches, like the note
+        distribution does.
+    """
+    def subtotal_key(key: str, stat_type: str) -> str:
+        ret_key = f"{key}_{stat_type}"
+        return f"total_{ret_key}" if key in APPEND_TOTAL else ret_key
+
+    columns: Dict[str, List[str]] = dict()
+    columns["meta"] = ["title", "title_localized", "artist", "illustrator",
+                       "charter", "diff", "level"]
+    columns["length"] = ["length"]
+    columns["scan_line"] = [evt_type.name for evt_type in EventType]
+    columns["scan_line"].append("speed_changes")
+    columns["scan_line"].extend(
+        f"{stat_type}_bpm_{key}" if key != "bpm" else f"{stat_type}_bpm"
+        for stat_type in ("min", "mode", "max")
+        for key in ("base", "ticks", "bpm"))
+    columns["events"] = [f"authored_{evt_type.name}" for evt_type in EventType]
+    columns["events"].append("authored_speed_changes")
+
+    columns["note_counts"] = []
+    for stat_type in ("notes", "rate"):
+        columns["note_counts"].extend(f"{nt.name}_{stat_type}"
+                                      for nt in NoteType)
+        columns["note_counts"].extend(subtotal_key(key, stat_type)
+                                      for key in SUBTOTAL_KEYS)
+        if stat_type == "notes":
+            columns["note_counts"].extend(["avg_taps", "total_notes"])
+    columns["note_rates"] = ["avg_taps_per_sec", "notes_per_sec"]
+
+    columns["peak_densities"] = []
+    for stat_type in ("notes", "taps"):
+        columns["peak_densities"].extend(
+            f"peak_{window:g}s_{stat_type}_per_sec" for window in peak_windows)
+        columns["peak_densities"].append(f"peak_page_{stat_type}_per_sec")
+
+    columns["page_stats"] = ["max_notes_per_page", "avg_notes_per_page"]
+    columns["page_stats"].extend(f"p{pct}_notes_per_page"
+                                 for pct in PAGE_PERCENTILES)
+    columns["page_stats"].extend([
+        "empty_pages_rate", "mixed_pages_rate", "max_page_x_spread",
+        "avg_page_x_spread", "up_pages_rate", "up_notes_rate"])
+
+    columns["drag_chains"] = [
+        key.format(chain_type) for chain_type in CHAIN_TYPES
+        for key in ("{}_chains", "longest_{}_chain", "avg_{}_chain_length",
+                    "longest_{}_chain_sec", "avg_{}_chain_x_travel",
+                    "avg_{}_chain_speed", "max_{}_chain_speed")]
+    columns["min_scores"] = ["min_fc_score", "min_fc_tp", "min_mm_tp"]
+    columns["strain"] = ["strain_rating", "peak_strain", "avg_strain"]
+    columns["movement"] = [
+        "avg_jump", f"p{JUMP_PERCENTILE}_jump", "max_jump", "avg_x_velocity",
+        "max_x_velocity", "chords", "chord_notes_rate", "avg_chord_spread",
+        "max_chord_spread", "hand_crossings", "hand_crossing_rate",
+        "left_notes_rate"]
+    return columns
+
 class Analyzer:
-    def __init__(self, folder: str, chart_id: str):
-        self.__open_files(folder, chart_id)
+    def __init__(self, folder: str, chart_id: str,
+                 peak_windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS,
+                 stats: Optional[Iterable[str]] = None,
+                 level_info: Optional[LevelInfo] = None):
+        self.__open_files(folder, chart_id, level_info)
+        self._init_stats(peak_windows, stats)
+
+    @staticmethod
+    def from_level(level_info: LevelInfo, chart_info: ChartInfo, chart: Chart,
+                   music_path: str, music_length: Optional[int] = None,
+                   peak_windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS,
+                   stats: Optional[Iterable[str]] = None) -> 'Analyzer':
+        """
+            Makes an analyzer out of an already parsed level and chart
+            instead of reading them from the level's folder.
+        """
+        analyzer = Analyzer.__new__(Analyzer)
+        analyzer.level_info = level_info
+        analyzer.chart_info = chart_info
+        analyzer.chart = chart
+        analyzer.music_path = music_path
+        analyzer._init_stats(peak_windows, stats)
+        analyzer.music_length = music_length
+        return analyzer
+
+    def _init_stats(self, peak_windows: Tuple[float, ...],
+                    stats: Optional[Iterable[str]]):
+        """
+            stats picks the stat groups (see STAT_GROUPS) to compute; only
+            the steps they need are run. All of them are computed by default.
+        """
+        self.peak_windows = peak_windows
+        self.steps = resolve_steps(STAT_GROUPS if stats is None else stats)
 
         self.note_counts: Dict[NoteType, int] = make_dict(NoteType)
         self.note_rates: Dict[NoteType, int] = make_dict(NoteType)
         self.speed_changes: Dict[EventType, int] = make_dict(EventType)
+        self.authored_speed_changes: Dict[EventType, int] = make_dict(EventType)
         self.scan_line_stats: Dict[str, Dict[str, float]] = {
             "min": {"base": -1, "ticks": -1, "bpm": float("inf")},
             "mode": {"base": -1, "ticks": -1, "bpm": -1},
             "max": {"base": -1, "ticks": -1, "bpm": float("-inf")}
         }
-        self.subtotals: Dict[str, int] = {
-            "hold": 0,
-            "drag_head": 0,
-            "drag_child": 0,
-            "cdrag": 0,
-            "drag": 0,
-            "total_drag": 0,
-        }
+        self.subtotals: Dict[str, int] = {key: 0 for key in SUBTOTAL_KEYS}
         self.min_scores: Dict[str, float] = {
             "fc_score": 1000000,
             "fc_tp": 100.00,
             "mm_tp": 100.00
         }
+        self.peak_densities: Dict[str, float] = dict()
+        self.page_stats: Dict[str, float] = dict()
+        self.drag_chain_stats: Dict[str, float] = dict()
+        self.strain_stats: Dict[str, float] = dict()
+        self.movement_stats: Dict[str, float] = dict()
+        self.music_length: Optional[int] = None
         self.nps_count = 0
 
-    def __open_files(self, folder: str, chart_id: str):
-        level_json_path = os.path.join(folder, chart_id, "level.json")
-        try:
-            with open(level_json_path, encoding="utf8") as level_json_file:
-                self.level_info = LevelInfo.from_dict(
-                    json.load(level_json_file), folder)
-
-                if not self.level_info.are_paths_valid():
-                    raise OSError(
-                        "One of the paths in the level.json is invalid"
-                    )
-        except Exception as err:
-            raise Exception(
-                f"There's something wrong with {chart_id}'s level.json"
-            ) from err
+    def __open_files(self, folder: str, chart_id: str,
+                     level_info: Optional[LevelInfo] = None):
+        if level_info is not None:
+            # Already checked, e.g. by Catalog.valid_level_info.
+            self.level_info = level_info
+        else:
+            self.__read_level_info(folder, chart_id)
 
         self.chart_info = self.level_info.charts[-1]
         level_paths = self.level_info.paths
         diff = self.chart_info.name
         try:
             chart_path = level_paths["charts"][diff]
-            with open(chart_path, encoding="utf8") as chart_file:
+            with bundle.open_file(chart_path, encoding="utf8") as chart_file:
                 self.chart = Chart.from_dict(json.load(chart_file))
         except Exception as err:
             raise Exception(
@@ -89,38 +196,100 @@ class Analyzer:
         else:
             self.music_path = level_paths["music"]
 
-    def start(self):
-        _, ext = os.path.splitext(self.music_path)
-        if ext == ".mp3":
-            music = MP3(self.music_path)
-        elif ext == ".ogg":
-            music = OggVorbis(self.music_path)
-        self.music_length = math.ceil(music.info.length)
-        self._get_scan_line_stats()
-        self._get_note_counts()
-        self._get_min_scores()
+    def __read_level_info(self, folder: str, chart_id: str):
+        level_json_path = os.path.join(folder, chart_id, "level.json")
+        try:
+            with bundle.open_file(level_json_path,
+                                  encoding="utf8") as level_json_file:
+                self.level_info = LevelInfo.from_dict(
+                    json.load(level_json_file), folder)
 
-    def get_stats_as_json(self) -> dict:
-        append_total = ("hold", "drag_head", "drag_child")
-        ret = OrderedDict()
-        meta = self.level_info.to_dict()
-        ret = {
-            key: meta[key] for key in 
-            ("title", "title_localized", "artist", "illustrator", "charter")
+                if not self.level_info.are_paths_valid():
+                    raise OSError(
+                        "One of the paths in the level.json is invalid"
+                    )
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {chart_id}'s level.json"
+            ) from err
+
+    def load_music(self):
+        self.music_length = get_music_length(self.music_path)
+
+    def needs(self, step: str) -> bool:
+        return step in self.steps
+
+    def start(self):
+        step_funcs = {
+            "music": self._get_music_length,
+            "columns": self._get_columns,
+            "tempo_map": self._get_tempo_map,
+            "note_secs": self._get_note_secs,
+            "scan_line": self._get_scan_line_stats,
+            "events": self._get_event_stats,
+            "note_counts": self._get_note_counts,
+            "note_rates": self._get_note_rates,
+            "peak_densities": self._get_peak_densities,
+            "page_stats": self._get_page_stats,
+            "drag_chains": self._get_drag_chain_stats,
+            "min_scores": self._get_min_scores,
+            "strain": self._get_strain_stats,
+            "movement": self._get_movement_stats,
         }
-        ret["length"] = self.music_length
-        ret["diff"] = self.chart_info.name
-        ret["level"] = self.chart_info.difficulty
+        for step in self.steps:
+            if step in step_funcs:
+                step_funcs[step]()
 
-        ret.update(self._convert_enum_key(self.speed_changes))
-        ret.update({"speed_changes": sum(self.speed_changes.values())})
+    def get_stats_as_json(self) -> dict:
+        ret = dict()
+        if self.needs("meta"):
+            meta = self.level_info.to_dict()
+            ret.update({
+                key: meta[key] for key in
+                ("title", "title_localized", "artist", "illustrator", "charter")
+            })
+        if self.needs("length"):
+            ret["length"] = self.music_length
+        if self.needs("meta"):
+            ret["diff"] = self.chart_info.name
+            ret["level"] = self.chart_info.difficulty
+
+        if self.needs("scan_line"):
+            ret.update(self._convert_enum_key(self.speed_changes))
+            ret.update({"speed_changes": sum(self.speed_changes.values())})
+        if self.needs("events"):
+            ret.update({f"authored_{key}": val for key, val in
+                        self._convert_enum_key(self.authored_speed_changes).items()})
+            ret["authored_speed_changes"] = sum(self.authored_speed_changes.values())
+
+        if self.needs("scan_line"):
+            for stat_type, stats in self.scan_line_stats.items():
+                for key, val in stats.items():
+                    ret_key = (f"{stat_type}_bpm_{key}" if key != "bpm"
+                               else f"{stat_type}_bpm")
+                    ret[ret_key] = val
+
+        if self.needs("note_counts"):
+            self._add_note_count_stats(ret)
+
+        if self.needs("note_rates"):
+            ret.update({
+                "avg_taps_per_sec": self.avg_taps_per_sec,
+                "notes_per_sec": self.notes_per_sec,
+            })
+        ret.update(self.peak_densities)
+        ret.update(self.page_stats)
+        ret.update(self.drag_chain_stats)
+
+        if self.needs("min_scores"):
+            for key, val in self.min_scores.items():
+                ret[f"min_{key}"] = val
+        ret.update(self.strain_stats)
+        ret.update(self.movement_stats)
 
-        for stat_type, stats in self.scan_line_stats.items():
-            for key, val in stats.items():
-                ret_key = (f"{stat_type}_bpm_{key}" if key != "bpm" 
-                           else f"{stat_type}_bpm")
-                ret[ret_key] = val
+        return ret
 
+    def _add_note_count_stats(self, ret: dict):
         for stat_type in ("notes", "rate"):
             note_stats = (self.note_counts if stat_type == "notes"
                           else self.note_rates)
@@ -131,107 +300,137 @@ class Analyzer:
                               else self.subtotal_rates)
             for key, val in subtotal_stats.items():
                 ret_key = f"{key}_{stat_type}"
-                ret_key = f"total_{ret_key}" if key in append_total else ret_key
+                ret_key = f"total_{ret_key}" if key in APPEND_TOTAL else ret_key
                 ret[ret_key] = val
 
             if stat_type == "notes":
                 ret["avg_taps"] = self.avg_taps
                 ret["total_notes"] = self.total_notes
 
-        ret.update({
-            "avg_taps_per_sec": self.avg_taps_per_sec,
-            "notes_per_sec": self.notes_per_sec,
-        })
+    def _get_scan_line_stats(self):
+        speeds = self._get_scan_line_speeds()
+        base, ticks, bpm = speeds["base_bpm"], speeds["ticks"], speeds["bpm"]
+
+        def get_speed(idx: int) -> Dict[str, float]:
+            return {
+                "base": round(float(base[idx]), 2),
+                "ticks": int(ticks[idx]),
+                "bpm": float(bpm[idx])
+            }
+
+        self.scan_line_stats["max"] = get_speed(np.argmax(bpm))
+        self.scan_line_stats["min"] = get_speed(np.argmin(bpm))
+
+        # Ties go to the speed that shows up first in the chart.
+        _, first_idxs, counts = np.unique(
+            np.stack([base, ticks], axis=1), axis=0,
+            return_index=True, return_counts=True)
+        mode_idxs = first_idxs[counts == counts.max()]
+        self.scan_line_stats["mode"] = get_speed(mode_idxs.min())
+
+        # Only a change in direction counts as a new speed change, so
+        # consecutive speed ups (or downs) are counted once.
+        changed = (base[1:] != base[:-1]) | (ticks[1:] != ticks[:-1])
+        is_speed_up = (np.diff(bpm) > 0)[changed]
+        is_new_change = np.concatenate((
+            is_speed_up[:1] == is_speed_up[:1],
+            is_speed_up[1:] != is_speed_up[:-1]
+        ))
+        speed_ups = int(np.sum(is_new_change & is_speed_up))
+        self.speed_changes[EventType.speed_up] = speed_ups
+        self.speed_changes[EventType.speed_down] = \
+            int(np.sum(is_new_change)) - speed_ups
+
+    def _get_scan_line_speeds(self) -> Dict[str, np.ndarray]:
+        """
+            Builds the scan line speed timeline as arrays. Every page gets one
+            entry per tempo starting inside it, or a single entry with the
+            tempo carried over from the previous pages if none do.
+        """
+        pages = self.pages
+        tempo_map = self.tempo_map
+        tempos = tempo_map.tempos
+
+        tempo_pages = np.searchsorted(pages.start_tick, tempos.tick,
+                                      side="right") - 1
+        in_page = (tempo_pages >= 0) & \
+            (tempos.tick < pages.end_tick[np.clip(tempo_pages, 0, None)])
+        tempo_counts = np.bincount(tempo_pages[in_page],
+                                   minlength=len(pages))
+
+        repeats = np.maximum(tempo_counts, 1)
+        page_idxs = np.repeat(np.arange(len(pages)), repeats)
+        ranks = np.arange(len(page_idxs)) - \
+            np.repeat(np.cumsum(repeats) - repeats, repeats)
+        prev_tempos = np.searchsorted(tempos.tick, pages.start_tick,
+                                      side="left") - 1
+        tempo_idxs = prev_tempos[page_idxs] + \
+            np.where(tempo_counts[page_idxs] > 0, ranks + 1, 0)
+        tempo_idxs = np.clip(tempo_idxs, 0, len(tempos) - 1)
+
+        base = tempos.bpm[tempo_idxs]
+        ticks = pages.ticks[page_idxs]
+        start_ticks = np.maximum(pages.start_tick[page_idxs],
+                                 tempos.tick[tempo_idxs])
+        self.scan_line_speeds = {
+            "page_index": page_idxs,
+            "start_tick": start_ticks,
+            "start_sec": np.round(tempo_map.to_sec(start_ticks), 3),
+            "base_bpm": base,
+            "ticks": ticks,
+            "bpm": np.round(base * 2 * self.chart.time_base / ticks, 2),
+            "direction": pages.scan_line_direction[page_idxs],
+        }
+        return self.scan_line_speeds
+
+    def get_scan_line_timeline(self) -> Dict[str, np.ndarray]:
+        """
+            Returns the scan line speed of every page as columns: the page
+            index, the tick and second the speed starts on, the base BPM, the
+            page length in ticks, the scan line BPM and the direction.
+        """
+        return self.scan_line_speeds
+
+    def _get_event_stats(self):
+        events = EventColumns.from_chart(self.chart)
+        type_counts = np.bincount(events.evt_type, minlength=len(EventType))
+        for evt_type in EventType:
+            self.authored_speed_changes[evt_type] = \
+                int(type_counts[evt_type.value])
+
+        type_names = np.array([evt_type.name for evt_type in EventType])
+        arg_names = np.array([evt_args.value for evt_args in EventArgs])
+        self.event_timeline = {
+            "tick": events.tick,
+            "sec": np.round(self.tempo_map.to_sec(events.tick), 3),
+            "type": type_names[events.evt_type],
+            "args": arg_names[events.evt_args],
+        }
 
-        for key, val in self.min_scores.items():
-            ret[f"min_{key}"] = val
+    def get_event_timeline(self) -> Dict[str, np.ndarray]:
+        """
+            Returns the tick, second, type and arguments of every authored
+            speed event as columns.
+        """
+        return self.event_timeline
 
-        return ret
+    def _get_music_length(self):
+        if self.music_length is None:
+            self.load_music()
 
-    def _get_scan_line_stats(self):
-        scan_line_speeds = self._get_scan_line_speeds()
-        scan_line_counts = dict()
-        mode_count = 0
-        prev_speed = scan_line_speeds[0]
-        prev_speed_change = None
-
-        for speed in scan_line_speeds:
-            if speed["bpm"] > self.scan_line_stats["max"]["bpm"]:
-                self.scan_line_stats["max"] = speed
-            if speed["bpm"] < self.scan_line_stats["min"]["bpm"]:
-                self.scan_line_stats["min"] = speed
-
-            if prev_speed is not None and speed != prev_speed:
-                speed_diff = speed["bpm"] - prev_speed["bpm"]
-                speed_change = EventType.speed_up if speed_diff > 0 else \
-                    EventType.speed_down
-
-                if speed_change != prev_speed_change:
-                    self.speed_changes[speed_change] += 1
-
-                prev_speed_change = speed_change
-
-            key = (speed["bpm"], speed["ticks"])
-            scan_line_counts[key] = scan_line_counts.setdefault(key, 0) + 1
-            prev_speed = speed
-
-        for speed, count in scan_line_counts.items():
-            if count > mode_count:
-                self.scan_line_stats["mode"] = {
-                    "base": speed[0],
-                    "ticks": speed[1],
-                    "bpm": self._get_bpm(speed[0], speed[1])
-                }
-                mode_count = count
-
-        for stat in self.scan_line_stats:
-            self.scan_line_stats[stat]["base"] = round(
-                self.scan_line_stats[stat]["base"], 2)
-
-    def _get_scan_line_speeds(self) -> List[Tuple[float]]:
-        scan_line_speeds = []
-        tempo_it, next_tempo_it = tee(iter(self.chart.tempo_list))
-
-        tempo = None
-        next_tempo = next(next_tempo_it)
-
-        for page in self.chart.page_list:
-            page_added = False
-
-            while next_tempo is not None and page.in_page(next_tempo):
-                tempo = next(tempo_it)
-                next_tempo = next(next_tempo_it, None)
-                bpm = self._get_bpm(tempo.bpm, page.ticks)
-                scan_line_speeds.append({
-                    "base": tempo.bpm,
-                    "ticks": page.ticks,
-                    "bpm": bpm
-                })
-                page_added = True
-
-            if not page_added:
-                bpm = self._get_bpm(tempo.bpm, page.ticks)
-                scan_line_speeds.append({
-                    "base": tempo.bpm,
-                    "ticks": page.ticks,
-                    "bpm": bpm
-                })
-
-        return scan_line_speeds
+    def _get_columns(self):
+        self.notes = NoteColumns.from_chart(self.chart)
+        self.pages = PageColumns.from_chart(self.chart)
+
+    def _get_tempo_map(self):
+        self.tempo_map = TempoMap.from_chart(self.chart)
+
+    def _get_note_secs(self):
+        self.note_secs = self.tempo_map.to_sec(self.notes.tick)
 
     def _get_note_counts(self):
-        hold_count = 0
         for note in self.chart.note_list:
             self.note_counts[note.note_type] += 1
-            if note.note_type in NOTE_CATEGORIES["hold"]:
-                start_sec = self._convert_to_sec(note.tick)
-                end_sec = self._convert_to_sec(note.tick + note.hold_tick)
-
-                duration = end_sec - start_sec + 1
-                self.nps_count += duration
-                hold_count += duration
-            else:
-                self.nps_count += 1
 
         self.total_notes = sum(self.note_counts.values())
         self.note_rates = dict()
@@ -253,9 +452,135 @@ class Analyzer:
 
         self.subtotal_rates = {st_key: round(count / self.total_notes, 4)
                                for st_key, count in self.subtotals.items()}
+
+    def _get_note_rates(self):
+        # Holds count once for every whole second they touch.
+        notes = self.notes
+        hold_codes = [nt.value for nt in NOTE_CATEGORIES["hold"]]
+        is_hold = np.isin(notes.note_type, hold_codes)
+        hold_ticks = notes.tick[is_hold]
+        start_secs = np.floor(self.tempo_map.to_sec(hold_ticks))
+        end_secs = np.floor(self.tempo_map.to_sec(
+            hold_ticks + notes.hold_tick[is_hold]))
+        self.nps_count = int(np.sum(end_secs - start_secs + 1)) \
+            + int(np.sum(~is_hold))
+
         self.avg_taps_per_sec = round(self.avg_taps / self.music_length, 2)
         self.notes_per_sec = round(self.nps_count / self.music_length, 2)
 
+    def _get_peak_densities(self):
+        notes = self.notes
+        tempo_map = self.tempo_map
+
+        # Holds count in every window and page they touch.
+        note_secs = self.note_secs
+        end_ticks = notes.tick + notes.hold_tick
+        end_secs = tempo_map.to_sec(end_ticks)
+        end_pages = np.searchsorted(self.pages.start_tick, end_ticks,
+                                    side="left") - 1
+        drag_child_codes = [nt.value for nt in NOTE_CATEGORIES["drag_child"]]
+        is_tap = ~np.isin(notes.note_type, drag_child_codes)
+        page_secs = (tempo_map.to_sec(self.pages.end_tick)
+                     - tempo_map.to_sec(self.pages.start_tick))
+
+        for stat_type, mask in (("notes", slice(None)), ("taps", is_tap)):
+            secs = np.sort(note_secs[mask])
+            for window in self.peak_windows:
+                count, _ = peak_window(secs, window, end_secs[mask])
+                key = f"peak_{window:g}s_{stat_type}_per_sec"
+                self.peak_densities[key] = round(count / window, 2)
+
+            page_rate = peak_page_rate(notes.page_index[mask], page_secs,
+                                       end_pages[mask])
+            key = f"peak_page_{stat_type}_per_sec"
+            self.peak_densities[key] = round(page_rate, 2)
+
+    def _get_page_stats(self):
+        notes = self.notes
+        page_count = len(self.pages)
+        on_page = (notes.page_index >= 0) & (notes.page_index < page_count)
+        page_index = notes.page_index[on_page]
+        note_type = notes.note_type[on_page]
+        x = notes.x[on_page]
+
+        counts = np.bincount(page_index, minlength=page_count)
+        mix_lookup = np.zeros(len(NoteType), dtype=np.int64)
+        for mix_idx, note_types in enumerate(PAGE_MIX_TYPES.values()):
+            mix_lookup[[nt.value for nt in note_types]] = mix_idx
+        mix_counts = np.bincount(
+            page_index * len(PAGE_MIX_TYPES) + mix_lookup[note_type],
+            minlength=page_count * len(PAGE_MIX_TYPES)
+        ).reshape(page_count, len(PAGE_MIX_TYPES))
+
+        x_min = np.full(page_count, np.inf)
+        x_max = np.full(page_count, -np.inf)
+        np.minimum.at(x_min, page_index, x)
+        np.maximum.at(x_max, page_index, x)
+        x_spread = np.where(counts > 0, x_max - x_min, 0.0)
+
+        is_up = self.pages.scan_line_direction == ScanLineDirection.up.value
+        self.page_table = {
+            "page_index": np.arange(page_count),
+            "start_tick": self.pages.start_tick,
+            "direction": self.pages.scan_line_direction,
+            "notes": counts,
+            **{f"{mix}_notes": mix_counts[:, mix_idx]
+               for mix_idx, mix in enumerate(PAGE_MIX_TYPES)},
+            "x_spread": np.round(x_spread, 3),
+        }
+
+        filled = counts > 0
+        self.page_stats["max_notes_per_page"] = int(counts.max(initial=0))
+        self.page_stats["avg_notes_per_page"] = \
+            round(float(counts.mean()), 2) if page_count else 0
+        for pct in PAGE_PERCENTILES:
+            self.page_stats[f"p{pct}_notes_per_page"] = round(float(
+                np.percentile(counts, pct)), 2) if page_count else 0
+
+        self.page_stats["empty_pages_rate"] = \
+            round(float(1 - filled.mean()), 4) if page_count else 0
+        self.page_stats["mixed_pages_rate"] = \
+            round(float(np.mean((mix_counts > 0).sum(axis=1) > 1)), 4) \
+            if page_count else 0
+        self.page_stats["max_page_x_spread"] = \
+            round(float(x_spread.max(initial=0)), 3)
+        self.page_stats["avg_page_x_spread"] = \
+            round(float(x_spread[filled].mean()), 3) if filled.any() else 0
+
+        self.page_stats["up_pages_rate"] = \
+            round(float(is_up.mean()), 4) if page_count else 0
+        self.page_stats["up_notes_rate"] = \
+            round(float(counts[is_up].sum() / counts.sum()), 4) \
+            if counts.sum() else 0
+
+    def get_page_table(self) -> Dict[str, np.ndarray]:
+        """
+            Returns the note count, type mix and x spread of every page as
+            columns, along with its start tick and scan line direction.
+        """
+        return self.page_table
+
+    def _get_drag_chain_stats(self):
+        for chain_type, heads in CHAIN_TYPES.items():
+            chains = get_chain_table(self.notes, self.note_secs, heads)
+            lengths = chains["length"]
+            moving = chains["duration"] > 0
+            speeds = chains["x_travel"][moving] / chains["duration"][moving]
+
+            self.drag_chain_stats[f"{chain_type}_chains"] = len(lengths)
+            self.drag_chain_stats[f"longest_{chain_type}_chain"] = \
+                int(lengths.max(initial=0))
+            self.drag_chain_stats[f"avg_{chain_type}_chain_length"] = \
+                round(float(lengths.mean()), 2) if len(lengths) else 0
+            self.drag_chain_stats[f"longest_{chain_type}_chain_sec"] = \
+                round(float(chains["duration"].max(initial=0)), 2)
+            self.drag_chain_stats[f"avg_{chain_type}_chain_x_travel"] = \
+                round(float(chains["x_travel"].mean()), 3) if len(lengths) else 0
+            self.drag_chain_stats[f"avg_{chain_type}_chain_speed"] = \
+                round(float(speeds.mean()), 3) if len(speeds) else 0
+            self.drag_chain_stats[f"max_{chain_type}_chain_speed"] = \
+                round(float(speeds.max(initial=0)), 3)
+
     def _get_min_scores(self):
         goods = 0
         greats = 0
@@ -269,32 +594,43 @@ class Analyzer:
             else:
                 perfects += count
 
-        self.min_scores["fc_score"] = math.floor(9e5 / self.total_notes * (
-            perfects + greats + 0.3 * goods) + 1e5)
-        self.min_scores["fc_tp"] = truncate((perfects + 0.7 * greats
-            + 0.3 * goods) / self.total_notes, 4)
-        self.min_scores["mm_tp"] = truncate((perfects + 0.7 * greats
-            + 0.7 * goods) / self.total_notes, 4)
-
-    def _get_bpm(self, base_bpm: float, ticks: int) -> float:
-        return round(base_bpm * 2 * self.chart.time_base / ticks, 2)
+        # Worst full combo: goods on MINIMUM_GOOD_NOTES, greats on
+        # MINIMIUM_GREAT_NOTES. A million master turns the goods into greats.
+        perfect, great, good = [JUDGEMENTS.index(judgement) for judgement
+                                in ("perfect", "great", "good")]
+        self.min_scores["fc_score"] = math.floor(
+            MAX_NOTE_SCORE / self.total_notes * (
+                perfects * NOTE_SCORE[perfect] + greats * NOTE_SCORE[great]
+                + goods * NOTE_SCORE[good]) + MAX_COMBO_SCORE)
+        self.min_scores["fc_tp"] = truncate((perfects * NOTE_TP[perfect]
+            + greats * NOTE_TP[great] + goods * NOTE_TP[good])
+            / self.total_notes, 4)
+        self.min_scores["mm_tp"] = truncate((perfects * NOTE_TP[perfect]
+            + greats * NOTE_TP[great] + goods * NOTE_TP[great])
+            / self.total_notes, 4)
+
+    def _get_strain_stats(self):
+        order = np.argsort(self.note_secs, kind="stable")
+        secs = self.note_secs[order]
+        page_index = self.notes.page_index[order]
+
+        page_secs = (self.tempo_map.to_sec(self.pages.end_tick)
+                     - self.tempo_map.to_sec(self.pages.start_tick))
+        on_page = (page_index >= 0) & (page_index < len(page_secs))
+        note_page_secs = np.zeros(len(order))
+        note_page_secs[on_page] = page_secs[page_index[on_page]]
+
+        strains = get_strains(secs, self.notes.x[order],
+                              self.notes.note_type[order], note_page_secs)
+        self.strain_stats["strain_rating"] = \
+            round(get_strain_rating(secs, strains), 2)
+        self.strain_stats["peak_strain"] = \
+            round(float(strains.max(initial=0)), 2)
+        self.strain_stats["avg_strain"] = \
+            round(float(strains.mean()), 2) if len(strains) else 0
+
+    def _get_movement_stats(self):
+        self.movement_stats = get_movement_stats(self.notes, self.note_secs)
 
     def _convert_enum_key(self, obj: Dict[Enum, Any]) -> Dict[str, Any]:
         return {key.name: val for key, val in obj.items()}
-
-    def _convert_to_sec(self, tick: int) -> int:
-        time_base = self.chart.time_base
-        tempos = self.chart.tempo_list
-
-        ms = 0
-        tempo = tempos[0]
-
-        for next_tempo in tempos[1:]:
-            if tick > next_tempo.tick:
-                ms += (next_tempo.tick - tempo.tick) / time_base * tempo.value
-                tempo = next_tempo
-            else:
-                break
-
-        ms += (tick - tempo.tick) / time_base * tempo.value
-        return int(math.floor(ms / 1e6))
\ No newline at end of file
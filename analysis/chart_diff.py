@@ -0,0 +1,142 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from chart import Chart, Note, Page, Tempo
+
+T = TypeVar("T")
+
+
+def merge_join(old_keys: Sequence[tuple], new_keys: Sequence[tuple]
+               ) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """
+        Matches two lists of keys after sorting them, so it runs in
+        O(n log n). Returns the matched (old, new) index pairs and the
+        unmatched old and new indices. Duplicate keys are matched one to one.
+    """
+    old_order = sorted(range(len(old_keys)), key=old_keys.__getitem__)
+    new_order = sorted(range(len(new_keys)), key=new_keys.__getitem__)
+    matched, old_only, new_only = [], [], []
+
+    old_pos = new_pos = 0
+    while old_pos < len(old_order) and new_pos < len(new_order):
+        old_idx = old_order[old_pos]
+        new_idx = new_order[new_pos]
+        old_key = old_keys[old_idx]
+        new_key = new_keys[new_idx]
+
+        if old_key == new_key:
+            matched.append((old_idx, new_idx))
+            old_pos += 1
+            new_pos += 1
+        elif old_key < new_key:
+            old_only.append(old_idx)
+            old_pos += 1
+        else:
+            new_only.append(new_idx)
+            new_pos += 1
+
+    old_only.extend(old_order[old_pos:])
+    new_only.extend(new_order[new_pos:])
+    return matched, old_only, new_only
+
+
+@dataclass
+class ChartDiff:
+    added_notes: List[Note] = field(default_factory=list)
+    removed_notes: List[Note] = field(default_factory=list)
+    moved_notes: List[Tuple[Note, Note]] = field(default_factory=list)
+    added_tempos: List[Tempo] = field(default_factory=list)
+    removed_tempos: List[Tempo] = field(default_factory=list)
+    added_pages: List[Page] = field(default_factory=list)
+    removed_pages: List[Page] = field(default_factory=list)
+    stat_deltas: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+
+    @staticmethod
+    def from_charts(old: Chart, new: Chart) -> 'ChartDiff':
+        diff = ChartDiff()
+
+        def note_key(note: Note) -> tuple:
+            return (note.tick, note.x, note.note_type.value)
+
+        _, old_only, new_only = merge_join([note_key(n) for n in old.note_list],
+                                           [note_key(n) for n in new.note_list])
+
+        # Notes that kept their ID and type but not their position moved.
+        new_by_id = {(new.note_list[idx].note_id,
+                      new.note_list[idx].note_type): idx for idx in new_only}
+        moved_new = set()
+        for idx in old_only:
+            old_note = old.note_list[idx]
+            new_idx = new_by_id.get((old_note.note_id, old_note.note_type))
+            if new_idx is not None and new_idx not in moved_new:
+                diff.moved_notes.append((old_note, new.note_list[new_idx]))
+                moved_new.add(new_idx)
+            else:
+                diff.removed_notes.append(old_note)
+
+        diff.added_notes = [new.note_list[idx] for idx in new_only
+                            if idx not in moved_new]
+
+        diff.removed_tempos, diff.added_tempos = ChartDiff._diff_list(
+            old.tempo_list, new.tempo_list, lambda t: (t.tick, t.value))
+        diff.removed_pages, diff.added_pages = ChartDiff._diff_list(
+            old.page_list, new.page_list,
+            lambda p: (p.start_tick, p.end_tick, p.scan_line_direction.value))
+
+        return diff
+
+    @staticmethod
+    def _diff_list(old: List[T], new: List[T], key: Callable[[T], tuple]
+                   ) -> Tuple[List[T], List[T]]:
+        _, old_only, new_only = merge_join([key(x) for x in old],
+                                           [key(x) for x in new])
+        return ([old[idx] for idx in sorted(old_only)],
+                [new[idx] for idx in sorted(new_only)])
+
+    def add_stat_deltas(self, old_stats: dict, new_stats: dict):
+        for key in old_stats.keys() | new_stats.keys():
+            old_val = old_stats.get(key)
+            new_val = new_stats.get(key)
+            if old_val != new_val:
+                self.stat_deltas[key] = (old_val, new_val)
+
+    def is_empty(self) -> bool:
+        return not any([self.added_notes, self.removed_notes, self.moved_notes,
+                        self.added_tempos, self.removed_tempos,
+                        self.added_pages, self.removed_pages,
+                        self.stat_deltas])
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "added_notes": len(self.added_notes),
+            "removed_notes": len(self.removed_notes),
+            "moved_notes": len(self.moved_notes),
+            "tempo_changes": len(self.added_tempos) + len(self.removed_tempos),
+            "page_changes": len(self.added_pages) + len(self.removed_pages),
+            "stat_changes": len(self.stat_deltas),
+        }
+
+    def to_dict(self) -> dict:
+        result: dict = {}
+        result["summary"] = self.summary()
+        result["added_notes"] = [n.to_dict() for n in self.added_notes]
+        result["removed_notes"] = [n.to_dict() for n in self.removed_notes]
+        result["moved_notes"] = [{"old": old.to_dict(), "new": new.to_dict()}
+                                 for old, new in self.moved_notes]
+        result["added_tempos"] = [t.to_dict() for t in self.added_tempos]
+        result["removed_tempos"] = [t.to_dict() for t in self.removed_tempos]
+        result["added_pages"] = [p.to_dict() for p in self.added_pages]
+        result["removed_pages"] = [p.to_dict() for p in self.removed_pages]
+        result["stat_deltas"] = {
+            key: {"old": old, "new": new,
+                  "delta": (round(new - old, 4)
+                            if _is_number(old) and _is_number(new) else None)}
+            for key, (old, new) in sorted(self.stat_deltas.items())
+        }
+        return result
+
+
+def _is_number(x: Any) -> bool:
+    return isinstance(x, (int, float, np.number)) and not isinstance(x, bool)
@@ -0,0 +1,64 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def window_counts(secs: np.ndarray, window: float,
+                  end_secs: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+        Counts the notes touching [end, end + window) for every note end in
+        end_secs: the ones that start before the span is over and don't end
+        before it begins. secs must be sorted, end_secs can be in any order
+        and defaults to secs. This is the two-pointer sweep over the note
+        times done as two searchsorteds.
+    """
+    if end_secs is None:
+        end_secs = secs
+    started = np.searchsorted(secs, end_secs + window, side="left")
+    ended = np.searchsorted(np.sort(end_secs), end_secs, side="left")
+    return started - ended
+
+
+def peak_window(secs: np.ndarray, window: float,
+                end_secs: Optional[np.ndarray] = None) -> Tuple[int, float]:
+    """
+        Returns the most notes touching any window-second span of the sorted
+        secs along with the second that span starts on, so a hold counts in
+        every span it touches like it does in notes_per_sec. A span can
+        always be moved later until it starts on a note's end without losing
+        notes, so only those spans are counted.
+    """
+    if len(secs) == 0:
+        return 0, 0.0
+
+    if end_secs is None:
+        end_secs = secs
+    counts = window_counts(secs, window, end_secs)
+    peak_idx = int(np.argmax(counts))
+    return int(counts[peak_idx]), float(end_secs[peak_idx])
+
+
+def peak_page_rate(page_index: np.ndarray, page_secs: np.ndarray,
+                   end_page_index: Optional[np.ndarray] = None) -> float:
+    """
+        Returns the highest notes per second of any page given the page index
+        of every note, the page it ends on (its own page by default) and the
+        length of every page in seconds. Notes count in every page from the
+        one they start on to the one they end on.
+    """
+    if len(page_index) == 0:
+        return 0.0
+
+    page_count = len(page_secs)
+    if end_page_index is None:
+        end_page_index = page_index
+    starts = np.minimum(page_index, page_count)
+    ends = np.minimum(np.maximum(end_page_index, page_index), page_count)
+    spans = np.bincount(starts, minlength=page_count + 2) \
+        - np.bincount(ends + 1, minlength=page_count + 2)
+    counts = np.cumsum(spans)[:page_count]
+    valid = page_secs > 0
+    if not valid.any():
+        return 0.0
+
+    return float(np.max(counts[valid] / page_secs[valid]))
@@ -0,0 +1,93 @@
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+from chart import NoteColumns, NoteType
+
+CHAIN_HEADS = [NoteType.drag_head, NoteType.cdrag_head]
+CHAIN_CHILDREN = [NoteType.drag_child, NoteType.cdrag_child]
+
+
+def build_id_lookup(note_id: np.ndarray) -> np.ndarray:
+    """
+        Returns an array mapping every note ID to its index in the note list,
+        with -1 for IDs that aren't used.
+    """
+    size = int(note_id.max()) + 1 if len(note_id) else 0
+    lookup = np.full(max(size, 0), -1, dtype=np.int64)
+    lookup[note_id[note_id >= 0]] = np.flatnonzero(note_id >= 0)
+    return lookup
+
+
+def get_next_idxs(notes: NoteColumns) -> np.ndarray:
+    """
+        Resolves every Note.next_id to the index of that note, or -1 if the
+        note doesn't link to a drag child. Chains end on a next_id of -1;
+        other notes have 0, which is a real note ID, so a link only counts if
+        it leads to a drag child.
+    """
+    lookup = build_id_lookup(notes.note_id)
+    next_id = notes.next_id
+    linked = (next_id >= 0) & (next_id < len(lookup))
+
+    next_idxs = np.full(len(notes), -1, dtype=np.int64)
+    next_idxs[linked] = lookup[next_id[linked]]
+
+    child_codes = [nt.value for nt in CHAIN_CHILDREN]
+    to_child = np.isin(notes.note_type[np.clip(next_idxs, 0, None)],
+                       child_codes)
+    next_idxs[~to_child] = -1
+    return next_idxs
+
+
+def walk_chains(notes: NoteColumns,
+                heads: Iterable[NoteType] = CHAIN_HEADS) -> Iterator[List[int]]:
+    """
+        Yields the note indices of every chain starting on one of the given
+        head types, in order. Every note is visited at most once, so this is
+        linear in the number of notes even if a chart links notes in a cycle.
+    """
+    next_idxs = get_next_idxs(notes).tolist()
+    head_codes = [nt.value for nt in heads]
+    visited = [False] * len(next_idxs)
+
+    for head_idx in np.flatnonzero(np.isin(notes.note_type, head_codes)):
+        chain = []
+        idx = int(head_idx)
+        while idx != -1 and not visited[idx]:
+            visited[idx] = True
+            chain.append(idx)
+            idx = next_idxs[idx]
+
+        yield chain
+
+
+def get_chain_table(notes: NoteColumns, note_secs: np.ndarray,
+                    heads: Iterable[NoteType] = CHAIN_HEADS) -> dict:
+    """
+        Returns the head index, note count, duration in seconds and total x
+        distance travelled of every chain as columns.
+    """
+    chains = list(walk_chains(notes, heads))
+    lengths = np.array([len(chain) for chain in chains], dtype=np.int64)
+    if len(chains) == 0:
+        empty = np.zeros(0)
+        return {"head": lengths, "length": lengths, "duration": empty,
+                "x_travel": empty}
+
+    flat_idxs = np.concatenate(chains)
+    chain_ids = np.repeat(np.arange(len(chains)), lengths)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    steps = np.abs(np.diff(notes.x[flat_idxs].astype(np.float64)))
+    same_chain = chain_ids[1:] == chain_ids[:-1]
+    x_travel = np.bincount(chain_ids[1:][same_chain],
+                           weights=steps[same_chain], minlength=len(chains))
+
+    return {
+        "head": flat_idxs[starts],
+        "length": lengths,
+        "duration": note_secs[flat_idxs[ends - 1]] - note_secs[flat_idxs[starts]],
+        "x_travel": x_travel,
+    }
@@ -0,0 +1,74 @@
+from typing import Dict
+
+import numpy as np
+
+from chart import NoteColumns, NoteType
+
+# Notes closer than CHORD_GAP are hit together, so the x distance between
+# them isn't a jump. Gaps are clamped to MIN_GAP for the velocity.
+from .strain import CHORD_GAP, MIN_GAP
+
+JUMP_PERCENTILE = 90
+# Notes closer than CROSS_GAP are taken to be hit with alternating hands.
+# If three of them in a row keep moving the same way by more than
+# CROSS_MARGIN, the first hand has to reach past the second one.
+CROSS_GAP = 0.25
+CROSS_MARGIN = 0.1
+# Drag children follow a finger that's already down, so they don't take a
+# new hand.
+FOLLOW_NOTES = [NoteType.drag_child, NoteType.cdrag_child]
+
+
+def get_movement_stats(notes: NoteColumns, note_secs: np.ndarray
+                       ) -> Dict[str, float]:
+    """
+        Jump distance and x velocity between consecutive notes in time, the
+        x spread of chords (notes sharing a tick), hand crossings and how
+        many notes are on the left half.
+    """
+    order = np.argsort(notes.tick, kind="stable")
+    tick = notes.tick[order]
+    secs = note_secs[order]
+    x = notes.x[order]
+    stats: Dict[str, float] = dict()
+
+    gaps = np.diff(secs)
+    jumps = np.abs(np.diff(x))
+    moved = gaps >= CHORD_GAP
+    jumps, gaps = jumps[moved], gaps[moved]
+    velocity = jumps / np.maximum(gaps, MIN_GAP)
+    stats["avg_jump"] = round(float(jumps.mean()), 3) if len(jumps) else 0
+    stats[f"p{JUMP_PERCENTILE}_jump"] = round(float(
+        np.percentile(jumps, JUMP_PERCENTILE)), 3) if len(jumps) else 0
+    stats["max_jump"] = round(float(jumps.max(initial=0)), 3)
+    stats["avg_x_velocity"] = \
+        round(float(velocity.mean()), 3) if len(velocity) else 0
+    stats["max_x_velocity"] = round(float(velocity.max(initial=0)), 3)
+
+    starts = np.flatnonzero(np.diff(tick, prepend=tick[:1] - 1)) \
+        if len(tick) else np.zeros(0, dtype=np.int64)
+    sizes = np.diff(starts, append=len(tick))
+    is_chord = sizes > 1
+    spreads = (np.maximum.reduceat(x, starts) - np.minimum.reduceat(x, starts)
+               )[is_chord] if len(tick) else np.zeros(0)
+    stats["chords"] = int(is_chord.sum())
+    stats["chord_notes_rate"] = \
+        round(float(sizes[is_chord].sum() / len(tick)), 4) if len(tick) else 0
+    stats["avg_chord_spread"] = \
+        round(float(spreads.mean()), 3) if len(spreads) else 0
+    stats["max_chord_spread"] = round(float(spreads.max(initial=0)), 3)
+
+    follow_codes = [nt.value for nt in FOLLOW_NOTES]
+    hit = ~np.isin(notes.note_type[order], follow_codes)
+    hit_gaps = np.diff(secs[hit])
+    hit_moves = np.diff(x[hit])
+    fast = (hit_gaps >= CHORD_GAP) & (hit_gaps < CROSS_GAP)
+    far = np.abs(hit_moves) > CROSS_MARGIN
+    crossings = fast[1:] & fast[:-1] & far[1:] & far[:-1] & \
+        (np.sign(hit_moves[1:]) == np.sign(hit_moves[:-1]))
+    stats["hand_crossings"] = int(crossings.sum())
+    stats["hand_crossing_rate"] = \
+        round(float(crossings.sum() / hit.sum()), 4) if hit.any() else 0
+    stats["left_notes_rate"] = \
+        round(float(np.mean(x < 0.5)), 4) if len(x) else 0
+    return stats
@@ -0,0 +1,22 @@
+import math
+import os
+
+from mutagen.mp3 import MP3
+from mutagen.oggvorbis import OggVorbis
+
+import bundle
+
+
+def get_music_length(music_path: str) -> int:
+    """
+        Reads the length of a song in whole seconds (rounded up) from the
+        audio file's header. Files inside archives are read in place, so
+        only the header is read from them when they're stored uncompressed.
+    """
+    _, ext = os.path.splitext(music_path)
+    with bundle.open_file(music_path, "rb") as music_file:
+        if ext == ".mp3":
+            music = MP3(music_file)
+        elif ext == ".ogg":
+            music = OggVorbis(music_file)
+    return math.ceil(music.info.length)
@@ -1,67 +1,174 @@
 import json
 import math
 import os
-from collections import OrderedDict
+import re
 from enum import Enum
-from itertools import tee
-from typing import Any, Dict, List, Tuple, TypeVar
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, TypeVar, Union
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import matplotlib.patheffects as path_fx
 import numpy as np
-from mutagen.mp3 import MP3
-from mutagen.oggvorbis import OggVorbis
 
-from chart import Chart, EventType, LevelInfo, NoteType
+import bundle
+from chart import (Chart, LevelInfo, NoteColumns, NoteType, PageColumns,
+                   TempoMap)
 
+from .density import peak_window
 from .dist_format import count_formats
+from .music import get_music_length
 
 EnumT = TypeVar("EnumT", bound=Enum)
 count_types = ["hold", "tap", "flick", "drag"]
 
+DIST_DPI = 150
+SECS_PER_INCH = 10
+FIG_HEIGHT = 8
+XTICK_SECS = 15
+# Bump this whenever the look of the plot changes, so cached images get
+# drawn again.
+RENDER_VERSION = 1
+PX_PER_SEC = DIST_DPI / SECS_PER_INCH
+# Room kept for the axis labels on the left and the legend on the right of
+# the plot area when the width is capped.
+LEFT_MARGIN_PX = 130
+RIGHT_MARGIN_PX = 270
+MARGIN_PX = LEFT_MARGIN_PX + RIGHT_MARGIN_PX
+BIN_AGGS = ("max", "mean")
+HEATMAP_X_BINS = 16
+HEATMAP_HEIGHT = 4
+# Bins are a number of seconds, or one beat or page each.
+DEFAULT_BIN_WIDTH = 1.0
+BIN_UNITS = ("beat", "page")
+BIN_WIDTH_REGEX = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s)?\s*$',
+                             re.IGNORECASE)
+BinWidth = Union[float, str]
+
+
+def get_count_type(note_type: NoteType) -> str:
+    if note_type is NoteType.cdrag_head:
+        return "tap"
+    elif "drag" in note_type.name:
+        return "drag"
+    elif "hold" in note_type.name:
+        return "hold"
+    return note_type.name
+
+
+COUNT_TYPE_LOOKUP = np.array([count_types.index(get_count_type(nt))
+                              for nt in NoteType])
+# Drag children aren't tapped, so they don't count towards the tap rate.
+UNTAPPED_NOTES = [NoteType.drag_child, NoteType.cdrag_child]
+
+
+def parse_bin_width(value: str) -> BinWidth:
+    """
+        Reads a bin width written as seconds (0.5 or 0.5s), milliseconds
+        (250ms) or one of BIN_UNITS.
+    """
+    if value.strip().lower() in BIN_UNITS:
+        return value.strip().lower()
+
+    match = BIN_WIDTH_REGEX.match(value)
+    if match is None or float(match.group(1)) <= 0:
+        raise ValueError(f"{value} is not a bin width (e.g. 250ms, 0.5s, "
+                         f"{' or '.join(BIN_UNITS)})")
+
+    width = float(match.group(1))
+    return width / 1000 if (match.group(2) or "").lower() == "ms" else width
+
+
+def format_bin_width(bin_width: BinWidth) -> str:
+    if isinstance(bin_width, str):
+        return bin_width
+    if bin_width < 1:
+        return f"{bin_width * 1000:g}ms"
+    return f"{bin_width:g}s"
+
 
 def truncate(num: float, decimals: int) -> float:
     base = 10 ** decimals
     return math.floor(num * base) / base
 
 
+def get_render_settings(peak_window_secs: Optional[float] = None,
+                        max_width: Optional[int] = None, agg: str = "max",
+                        tiles: bool = False, heatmap: bool = False,
+                        bin_width: BinWidth = DEFAULT_BIN_WIDTH) -> dict:
+    """
+        Everything besides the chart and song that changes the rendered
+        image.
+    """
+    return {
+        "version": RENDER_VERSION,
+        "matplotlib": mpl.__version__,
+        "dpi": DIST_DPI,
+        "secs_per_inch": SECS_PER_INCH,
+        "fig_height": FIG_HEIGHT,
+        "xtick_secs": XTICK_SECS,
+        "count_formats": count_formats,
+        "peak_window": peak_window_secs,
+        "max_width": max_width,
+        "agg": agg,
+        "tiles": tiles,
+        "heatmap": ({"x_bins": HEATMAP_X_BINS, "height": HEATMAP_HEIGHT}
+                    if heatmap else None),
+        "bin_width": bin_width,
+    }
+
+
+def get_bin_layout(bin_count: int, max_width: Optional[int]
+                   ) -> Tuple[int, int]:
+    """
+        Every bar is PX_PER_SEC pixels wide. Returns how many of bin_count
+        bins go in one bar so they all fit in max_width pixels, and how many
+        bins fit in one full detail tile.
+    """
+    if max_width is None:
+        return 1, bin_count
+
+    tile_bins = max(int((max_width - MARGIN_PX) // PX_PER_SEC), 1)
+    return math.ceil(bin_count / tile_bins), tile_bins
+
+
+def format_time(sec: float) -> str:
+    sec = int(sec)
+    return f"{sec//60:02}:{sec%60:02}"
+
+
 class NoteDistPlotter:
-    def __init__(self, folder: str, chart_id: str):
-        self.__open_files(folder, chart_id)
-
-        _, ext = os.path.splitext(self.music_path)
-        if ext == ".mp3":
-            music = MP3(self.music_path)
-        elif ext == ".ogg":
-            music = OggVorbis(self.music_path)
-        self.music_length = math.ceil(music.info.length)
+    def __init__(self, folder: str, chart_id: str,
+                 level_info: Optional[LevelInfo] = None):
+        self.__open_files(folder, chart_id, level_info)
+        # Built once and shared by the counts, the peak window and the
+        # heatmap.
+        self.notes = NoteColumns.from_chart(self.chart)
+        self.tempo_map = TempoMap.from_chart(self.chart)
+        self.note_secs = self.tempo_map.to_sec(self.notes.tick)
+        self.note_end_secs = self.tempo_map.to_sec(self.notes.tick
+                                                   + self.notes.hold_tick)
+
+        self.music_length = get_music_length(self.music_path)
+        self.bin_width: BinWidth = DEFAULT_BIN_WIDTH
+        self.bin_edges = np.arange(self.music_length + 1, dtype=np.float64)
         self.note_counts = {ct: np.zeros(self.music_length)
                             for ct in count_types}
         self.tap_counts = 0
 
-    def __open_files(self, folder: str, chart_id: str):
-        level_json_path = os.path.join(folder, chart_id, "level.json")
-        try:
-            with open(level_json_path, encoding="utf8") as level_json_file:
-                self.level_info = LevelInfo.from_dict(
-                    json.load(level_json_file), folder)
-
-                if not self.level_info.are_paths_valid():
-                    raise OSError(
-                        "One of the paths in the level.json is invalid"
-                    )
-        except Exception as err:
-            raise Exception(
-                f"There's something wrong with {chart_id}'s level.json"
-            ) from err
+    def __open_files(self, folder: str, chart_id: str,
+                     level_info: Optional[LevelInfo] = None):
+        if level_info is not None:
+            # Already checked, e.g. by Catalog.valid_level_info.
+            self.level_info = level_info
+        else:
+            self.__read_level_info(folder, chart_id)
 
         self.chart_info = self.level_info.charts[-1]
         level_paths = self.level_info.paths
         diff = self.chart_info.name
         try:
             chart_path = level_paths["charts"][diff]
-            with open(chart_path, encoding="utf8") as chart_file:
+            with bundle.open_file(chart_path, encoding="utf8") as chart_file:
                 self.chart = Chart.from_dict(json.load(chart_file))
         except Exception as err:
             raise Exception(
@@ -74,96 +181,303 @@ class NoteDistPlotter:
         else:
             self.music_path = level_paths["music"]
 
-    def count_notes(self) -> None:
-        for note in self.chart.note_list:
-            is_hold = "hold" in note.note_type.name
-
-            if note.note_type is NoteType.cdrag_head:
-                count_type = "tap"
-                self.tap_counts += 1
-            elif "drag" in note.note_type.name:
-                count_type = "drag"
-                if "head" in note.note_type.name:
-                    self.tap_counts += 1
-            elif "hold" in note.note_type.name:
-                count_type = "hold"
-                self.tap_counts += 1
-            else:
-                count_type = note.note_type.name
-                self.tap_counts += 1
-
-            sec = self._convert_to_sec(note.tick)
-            self.note_counts[count_type][sec] += 1
-
-            if note.hold_tick != 0:
-                end_tick = note.tick + note.hold_tick
-                end_sec = self._convert_to_sec(end_tick)
-                for mid_sec in range(sec + 1, end_sec + 1):
-                    self.note_counts[count_type][mid_sec] += 1
-
-    def _convert_to_sec(self, tick: int) -> int:
-        time_base = self.chart.time_base
-        tempos = self.chart.tempo_list
-
-        ms = 0
-        tempo = tempos[0]
-
-        for next_tempo in tempos[1:]:
-            if tick > next_tempo.tick:
-                ms += (next_tempo.tick - tempo.tick) / time_base * tempo.value
-                tempo = next_tempo
-            else:
-                break
-
-        ms += (tick - tempo.tick) / time_base * tempo.value
-        return int(math.floor(ms / 1e6))
-
-    def plot_counts(self, dest: str):
+    def __read_level_info(self, folder: str, chart_id: str):
+        level_json_path = os.path.join(folder, chart_id, "level.json")
+        try:
+            with bundle.open_file(level_json_path,
+                                  encoding="utf8") as level_json_file:
+                self.level_info = LevelInfo.from_dict(
+                    json.load(level_json_file), folder)
+
+                if not self.level_info.are_paths_valid():
+                    raise OSError(
+                        "One of the paths in the level.json is invalid"
+                    )
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {chart_id}'s level.json"
+            ) from err
+
+    def count_notes(self, bin_width: BinWidth = DEFAULT_BIN_WIDTH) -> None:
+        """
+            Counts the notes of each count type in every bin, with holds
+            counted once in every bin they touch. All note times are
+            converted in one go, and each hold adds +1/-1 to the bins it
+            starts and ends in, so a cumulative sum gives the counts.
+        """
+        notes = self.notes
+        self.bin_width = bin_width
+        self.bin_edges = self._get_bin_edges(bin_width, self.tempo_map)
+        bin_count = len(self.bin_edges) - 1
+
+        def to_bins(secs: np.ndarray) -> np.ndarray:
+            bins = np.searchsorted(self.bin_edges, secs, side="right") - 1
+            return np.clip(bins, 0, bin_count - 1)
+
+        start_bins = to_bins(self.note_secs)
+        end_bins = np.maximum(to_bins(self.note_end_secs), start_bins)
+        ct_idxs = COUNT_TYPE_LOOKUP[notes.note_type]
+        spans = np.zeros((len(count_types), bin_count + 1))
+        np.add.at(spans, (ct_idxs, start_bins), 1)
+        np.add.at(spans, (ct_idxs, end_bins + 1), -1)
+        counts = np.cumsum(spans, axis=1)[:, :-1]
+
+        self.note_counts = {ct: counts[idx]
+                            for idx, ct in enumerate(count_types)}
+        untapped_codes = [nt.value for nt in UNTAPPED_NOTES]
+        self.tap_counts = int(np.sum(~np.isin(notes.note_type,
+                                              untapped_codes)))
+
+    def _get_bin_edges(self, bin_width: BinWidth,
+                       tempo_map: TempoMap) -> np.ndarray:
+        """
+            Bin edges in seconds covering the whole song.
+        """
+        if bin_width == "beat":
+            time_base = self.chart.time_base
+            last_tick = tempo_map.to_tick(self.music_length)
+            ticks = np.arange(0, last_tick + time_base, time_base)
+            edges = tempo_map.to_sec(ticks)
+        elif bin_width == "page":
+            pages = PageColumns.from_chart(self.chart)
+            edges = tempo_map.to_sec(np.append(pages.start_tick,
+                                               pages.end_tick[-1:]))
+        else:
+            bin_count = math.ceil(self.music_length / bin_width)
+            return np.arange(bin_count + 1) * float(bin_width)
+
+        # Notes before the first or after the last page still get a bin.
+        edges = np.unique(np.clip(edges, 0, self.music_length))
+        return np.unique(np.concatenate(([0], edges, [self.music_length])))
+
+    def get_bin_table(self) -> Dict[str, np.ndarray]:
+        """
+            Returns the start and end second of every bin, the notes of each
+            count type in it and their total, as columns.
+        """
+        table = {"start_sec": self.bin_edges[:-1],
+                 "end_sec": self.bin_edges[1:]}
+        table.update(self.note_counts)
+        table["total"] = sum(self.note_counts.values())
+        return table
+
+    @property
+    def bin_count(self) -> int:
+        return len(self.bin_edges) - 1
+
+    def plot_counts(self, dest: Union[str, BinaryIO],
+                    peak_window_secs: Optional[float] = None,
+                    start_bin: int = 0, end_bin: Optional[int] = None,
+                    bar_bins: int = 1, agg: str = "max",
+                    max_width: Optional[int] = None):
+        """
+            Plots the bins from start_bin up to end_bin (the whole song by
+            default). With bar_bins above 1, every bar stands for that many
+            bins: either the busiest bin in it (max) or their average (mean).
+            The average rate lines always cover the whole song.
+
+            With max_width, the image is never wider than that many pixels;
+            anything that doesn't fit (e.g. a long title) is cut off.
+        """
+        if end_bin is None:
+            end_bin = self.bin_count
+        is_part = start_bin > 0 or end_bin < self.bin_count
+        start_sec = self.bin_edges[start_bin]
+        end_sec = self.bin_edges[end_bin]
+
         plt.rc("font", size=16)
         plt.rc('xtick', labelsize=12)
         plt.rc('ytick', labelsize=12)
 
-        fig, ax = plt.subplots(dpi=150, figsize=(self.music_length / 10, 8))
-        xaxis = np.arange(self.music_length)
-        xticks = np.arange(0, self.music_length, 15)
-        cum_total_counts = np.zeros(self.music_length)
+        lefts, widths, bin_counts = self._bin_counts(start_bin, end_bin,
+                                                     bar_bins, agg)
+        bar_count = len(lefts)
+        # One second bins have always been drawn centered on their second.
+        offset = -0.5 if self.bin_width == DEFAULT_BIN_WIDTH else 0
+        # The rate lines are drawn at their height per (typical) bin. Beat
+        # and page bins vary, and the last one may run on past the chart.
+        secs_per_bin = float(np.median(np.diff(self.bin_edges)))
+        if max_width is None:
+            fig, ax = plt.subplots(dpi=DIST_DPI,
+                                   figsize=(bar_count / SECS_PER_INCH,
+                                            FIG_HEIGHT))
+        else:
+            width = min(bar_count * PX_PER_SEC + MARGIN_PX, max_width)
+            fig, ax = plt.subplots(dpi=DIST_DPI,
+                                   figsize=(width / DIST_DPI, FIG_HEIGHT))
+            fig.subplots_adjust(left=LEFT_MARGIN_PX / width,
+                                right=1 - RIGHT_MARGIN_PX / width)
+        # A tick every XTICK_SECS bars, in whole seconds.
+        xtick_step = max(round(XTICK_SECS * bar_bins * secs_per_bin), 1)
+        xticks = np.arange(start_sec, end_sec, xtick_step)
+        cum_total_counts = np.zeros(len(lefts))
 
         ax.margins(0.01)
         title = self.level_info.title
         if self.level_info.title_localized:
             title = self.level_info.title_localized
 
-        ax.set_title(f"Note Distribution of {title} ({self.chart_info.name}, "
-                     f"Lv. {self.chart_info.difficulty})")
+        subtitle = ""
+        if is_part:
+            subtitle += f", {format_time(start_sec)}-{format_time(end_sec)}"
+        if self.bin_width != DEFAULT_BIN_WIDTH:
+            subtitle += f", {format_bin_width(self.bin_width)} bins"
+        if bar_bins > 1:
+            subtitle += (f", {agg} of every {bar_bins}s"
+                         if self.bin_width == DEFAULT_BIN_WIDTH
+                         else f", {agg} of every {bar_bins} bins")
+        # Narrow images get the chart info on its own line.
+        title_sep = " " if max_width is None else "\n"
+        ax.set_title(f"Note Distribution of {title}{title_sep}"
+                     f"({self.chart_info.name}, "
+                     f"Lv. {self.chart_info.difficulty}{subtitle})")
         ax.set_xlabel("Time")
-        ax.set_ylabel("No. of Notes")
+        ax.set_ylabel("No. of Notes" if self.bin_width == DEFAULT_BIN_WIDTH
+                      else "No. of Notes per Bin")
         ax.set_xticks(xticks)
-        ax.set_xticklabels([f"{t//60:02}:{t%60:02}" for t in xticks])
+        ax.set_xticklabels([format_time(t) for t in xticks])
         ax.grid(axis='y')
         ax.set_axisbelow(True)
         ax.set_facecolor("#F0F0F0")
 
-        for ct, counts in self.note_counts.items():
-            ax.bar(xaxis, counts, bottom=cum_total_counts,
-                   **count_formats[ct], width=1.0)
+        for ct, counts in bin_counts.items():
+            ax.bar(lefts + offset, counts, bottom=cum_total_counts,
+                   **count_formats[ct], width=widths, align="edge")
             cum_total_counts += counts
 
-        avg_note_rate = np.average(cum_total_counts)
-        note_rate_line = ax.axhline(avg_note_rate, c='k', lw=3)
-        ax.text(0, avg_note_rate,
-                f"Avg. Note Rate: {avg_note_rate:0.2f} NPS",
+        total_counts = sum(self.note_counts.values())
+        avg_note_count = np.average(total_counts)
+        note_rate_line = ax.axhline(avg_note_count, c='k', lw=3)
+        # Holds count in every bin they touch, which is only a rate for one
+        # second bins.
+        ax.text(start_sec, avg_note_count,
+                f"Avg. Note Rate: {avg_note_count:0.2f} NPS"
+                if self.bin_width == DEFAULT_BIN_WIDTH
+                else f"Avg. Notes per Bin: {avg_note_count:0.2f}",
                 c='w', weight="bold", va="bottom",
                 path_effects=[path_fx.withStroke(linewidth=3, foreground='k')])
 
         avg_tap_rate = self.tap_counts / self.music_length
-        ax.axhline(avg_tap_rate, c='r', lw=3)
-        ax.text(0, avg_tap_rate,
+        ax.axhline(avg_tap_rate * secs_per_bin, c='r', lw=3)
+        ax.text(start_sec, avg_tap_rate * secs_per_bin,
                 f"Avg. Tap Rate: {avg_tap_rate:0.2f} TPS",
                 c='w', weight="bold", va="top",
                 path_effects=[path_fx.withStroke(linewidth=3, foreground='r')])
 
-        combo_ceil = np.max(cum_total_counts)
+        if peak_window_secs is not None:
+            self._plot_peak_window(ax, peak_window_secs, offset,
+                                   secs_per_bin)
+
+        if is_part:
+            # The peak window may lie outside this part of the song.
+            margin = (end_sec - start_sec) * 0.01
+            ax.set_xlim(start_sec + offset - margin, end_sec + offset + margin)
+
+        combo_ceil = np.max(cum_total_counts, initial=0)
         ax.legend(loc="upper left", bbox_to_anchor=(1, 1))
 
-        fig.savefig(dest, bbox_inches='tight', pad_inches=0.25)
+        if max_width is None:
+            fig.savefig(dest, format="png", bbox_inches='tight',
+                        pad_inches=0.25)
+        else:
+            fig.savefig(dest, format="png")
+        plt.close(fig)
+
+    def plot_heatmap(self, dest: Union[str, BinaryIO], bin_secs: int = 1,
+                     max_width: Optional[int] = None):
+        """
+            Plots where the notes are across the screen over the song: one
+            column per bin_secs seconds and one row per HEATMAP_X_BINS-th of
+            the width, colored by how many notes land there.
+        """
+        bin_count = math.ceil(self.music_length / bin_secs)
+        counts, _, _ = np.histogram2d(
+            self.note_secs, self.notes.x, bins=(bin_count, HEATMAP_X_BINS),
+            range=((0, bin_count * bin_secs), (0, 1)))
+
+        plt.rc("font", size=16)
+        plt.rc('xtick', labelsize=12)
+        plt.rc('ytick', labelsize=12)
+
+        width = bin_count * PX_PER_SEC + MARGIN_PX
+        if max_width is not None:
+            width = min(width, max_width)
+        fig, ax = plt.subplots(dpi=DIST_DPI,
+                               figsize=(width / DIST_DPI, HEATMAP_HEIGHT))
+        fig.subplots_adjust(left=LEFT_MARGIN_PX / width,
+                            right=1 - RIGHT_MARGIN_PX / width, bottom=0.15)
+
+        title = self.level_info.title
+        if self.level_info.title_localized:
+            title = self.level_info.title_localized
+        subtitle = f", sum of every {bin_secs}s" if bin_secs > 1 else ""
+        title_sep = " " if max_width is None else "\n"
+        ax.set_title(f"Note Positions of {title}{title_sep}"
+                     f"({self.chart_info.name}, "
+                     f"Lv. {self.chart_info.difficulty}{subtitle})")
+
+        image = ax.imshow(counts.T, aspect="auto", origin="lower",
+                          cmap="magma", interpolation="nearest",
+                          extent=(0, bin_count * bin_secs, 0, 1))
+        xticks = np.arange(0, self.music_length, XTICK_SECS * bin_secs)
+        ax.set_xticks(xticks)
+        ax.set_xticklabels([format_time(t) for t in xticks])
+        ax.set_xlabel("Time")
+        ax.set_yticks([0, 0.5, 1])
+        ax.set_yticklabels(["Left", "Center", "Right"])
+        fig.colorbar(image, ax=ax, pad=0.01, label="No. of Notes")
+
+        fig.savefig(dest, format="png")
         plt.close(fig)
+
+    def _bin_counts(self, start_bin: int, end_bin: int, bar_bins: int,
+                    agg: str) -> Tuple[np.ndarray, np.ndarray,
+                                       Dict[str, np.ndarray]]:
+        """
+            Returns the left edge and width of every bar for the bins from
+            start_bin up to end_bin, along with its note counts.
+        """
+        lefts = self.bin_edges[start_bin:end_bin]
+        widths = np.diff(self.bin_edges)[start_bin:end_bin]
+        counts = {ct: self.note_counts[ct][start_bin:end_bin]
+                  for ct in count_types}
+        if bar_bins == 1:
+            return lefts, widths, counts
+
+        # Pad the last bar with empty bins.
+        bin_count = math.ceil(len(lefts) / bar_bins)
+        pad = bin_count * bar_bins - len(lefts)
+        lefts = lefts[::bar_bins]
+        widths = np.pad(widths, (0, pad), mode="edge").reshape(
+            bin_count, bar_bins).sum(1)
+        counts = {ct: np.pad(ct_counts, (0, pad)).reshape(bin_count, bar_bins)
+                  for ct, ct_counts in counts.items()}
+
+        if agg == "mean":
+            return lefts, widths, {ct: ct_counts.mean(axis=1)
+                                   for ct, ct_counts in counts.items()}
+
+        # Keep the split of the busiest bin, so the stacked bar still shows
+        # how many notes it really had.
+        busiest = np.argmax(sum(counts.values()), axis=1)
+        rows = np.arange(bin_count)
+        return lefts, widths, {ct: ct_counts[rows, busiest]
+                               for ct, ct_counts in counts.items()}
+
+    def _plot_peak_window(self, ax: plt.Axes, window: float,
+                          offset: float = -0.5, secs_per_bin: float = 1):
+        secs = np.sort(self.note_secs)
+        count, start = peak_window(secs, window, self.note_end_secs)
+        peak_rate = count / window
+
+        # One second bars are centered on their second, so each one starts
+        # half a bar before its x position.
+        ax.axvspan(start + offset, start + window + offset, color="#FFD54F",
+                   alpha=0.35, zorder=0)
+        ax.hlines(peak_rate * secs_per_bin, start + offset,
+                  start + window + offset, colors="#E65100", lw=3)
+        ax.text(start + offset, peak_rate * secs_per_bin,
+                f"Peak {window:g}s Note Rate: {peak_rate:0.2f} NPS",
+                c='w', weight="bold", va="bottom",
+                path_effects=[path_fx.withStroke(linewidth=3,
+                                                 foreground="#E65100")])
@@ -0,0 +1,200 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chart import NoteType
+
+# Judgements from best to worst. "perfect" is the rainbow perfect that gets
+# the full TP, "great" is the plain perfect.
+JUDGEMENTS = ("perfect", "great", "good", "bad", "miss")
+# Share of a note's score and TP each judgement gets, in JUDGEMENTS order.
+NOTE_SCORE = (1.0, 1.0, 0.3, 0.0, 0.0)
+NOTE_TP = (1.0, 0.7, 0.3, 0.0, 0.0)
+# Notes make up 900000 points and the max combo the other 100000.
+MAX_NOTE_SCORE = 900000
+MAX_COMBO_SCORE = 100000
+COMBO_BREAKS = ("bad", "miss")
+
+MODEL_NOTE_GROUPS: Dict[str, List[NoteType]] = {
+    "tap": [NoteType.tap, NoteType.cdrag_head],
+    "hold": [NoteType.hold, NoteType.long_hold],
+    "flick": [NoteType.flick],
+    "drag": [NoteType.drag_head, NoteType.drag_child, NoteType.cdrag_child],
+}
+DEFAULT_RUNS = 1000
+SIM_PERCENTILES = (5, 25, 50, 75, 95)
+# Runs are sampled in blocks of about this many judgements, so long charts
+# don't need the whole runs x notes matrix at once.
+BLOCK_JUDGEMENTS = 1 << 22
+
+
+@dataclass
+class AccuracyModel:
+    """
+        How likely a player is to get each judgement on each group of notes
+        (see MODEL_NOTE_GROUPS), as probabilities in JUDGEMENTS order.
+    """
+    name: str
+    judgements: Dict[str, Tuple[float, ...]]
+
+    def __post_init__(self):
+        for group, probs in self.judgements.items():
+            if group not in MODEL_NOTE_GROUPS:
+                raise KeyError(f"{group} is not a note group.")
+            if len(probs) != len(JUDGEMENTS) or min(probs) < 0 or \
+                    abs(sum(probs) - 1) > 1e-6:
+                raise ValueError(
+                    f"The {group} judgements of the {self.name} model should "
+                    f"be {len(JUDGEMENTS)} probabilities that add up to 1."
+                )
+        missing = set(MODEL_NOTE_GROUPS) - set(self.judgements)
+        if missing:
+            raise KeyError(f"The {self.name} model has no judgements for "
+                           f"{', '.join(sorted(missing))}.")
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'AccuracyModel':
+        assert isinstance(obj, dict), "Object is not a dict."
+        judgements = {group: tuple(float(p) for p in probs)
+                      for group, probs in obj["judgements"].items()}
+        return AccuracyModel(str(obj.get("name", "custom")), judgements)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name,
+                "judgements": {group: list(probs) for group, probs
+                               in self.judgements.items()}}
+
+    def get_cum_probs(self, note_type: np.ndarray) -> np.ndarray:
+        """
+            Returns the cumulative judgement probabilities of every note, one
+            row per note, without the last column (which is always 1).
+        """
+        table = np.zeros((len(NoteType), len(JUDGEMENTS) - 1))
+        for group, note_types in MODEL_NOTE_GROUPS.items():
+            cum_probs = np.cumsum(self.judgements[group])[:-1]
+            for nt in note_types:
+                table[nt.value] = cum_probs
+        return table[note_type]
+
+
+ACCURACY_MODELS: Dict[str, AccuracyModel] = {model.name: model for model in [
+    AccuracyModel("casual", {
+        "tap": (0.55, 0.30, 0.10, 0.03, 0.02),
+        "hold": (0.60, 0.28, 0.08, 0.02, 0.02),
+        "flick": (0.60, 0.35, 0.0, 0.0, 0.05),
+        "drag": (0.96, 0.0, 0.0, 0.0, 0.04),
+    }),
+    AccuracyModel("skilled", {
+        "tap": (0.80, 0.16, 0.03, 0.005, 0.005),
+        "hold": (0.82, 0.15, 0.02, 0.005, 0.005),
+        "flick": (0.85, 0.14, 0.0, 0.0, 0.01),
+        "drag": (0.995, 0.0, 0.0, 0.0, 0.005),
+    }),
+    AccuracyModel("expert", {
+        "tap": (0.95, 0.045, 0.004, 0.0005, 0.0005),
+        "hold": (0.95, 0.046, 0.003, 0.0005, 0.0005),
+        "flick": (0.97, 0.029, 0.0, 0.0, 0.001),
+        "drag": (0.9995, 0.0, 0.0, 0.0, 0.0005),
+    }),
+]}
+
+
+def get_score(note_score: np.ndarray, max_combo: np.ndarray,
+              total_notes: int) -> np.ndarray:
+    """
+        Score from the summed NOTE_SCORE of the notes and the max combo. A
+        chart without notes scores 0.
+    """
+    if total_notes == 0:
+        return np.zeros(len(note_score))
+    return np.floor(MAX_NOTE_SCORE / total_notes * note_score
+                    + MAX_COMBO_SCORE * max_combo / total_notes)
+
+
+def get_tp(note_tp: np.ndarray, total_notes: int) -> np.ndarray:
+    """
+        TP from the summed NOTE_TP of the notes, truncated to 4 decimals like
+        the min_scores stats. A chart without notes gets a TP of 0.
+    """
+    if total_notes == 0:
+        return np.zeros(len(note_tp))
+    return np.floor(note_tp / total_notes * 1e4) / 1e4
+
+
+def get_max_combos(breaks: np.ndarray) -> np.ndarray:
+    """
+        Longest streak of notes without a combo break in every row of a runs
+        x notes boolean matrix.
+    """
+    idxs = np.arange(breaks.shape[1])
+    last_break = np.maximum.accumulate(np.where(breaks, idxs, -1), axis=1)
+    return (idxs - last_break).max(axis=1, initial=0)
+
+
+def simulate_scores(note_type: np.ndarray, model: AccuracyModel,
+                    runs: int = DEFAULT_RUNS,
+                    rng: Optional[np.random.Generator] = None
+                    ) -> Dict[str, np.ndarray]:
+    """
+        Plays a chart runs times, drawing every note's judgement from model.
+        note_type is the type codes of the notes in the order they're hit.
+        Returns the score, TP, max combo and count of each judgement of every
+        run.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    total_notes = len(note_type)
+    cum_probs = model.get_cum_probs(note_type).astype(np.float32)
+    break_codes = [JUDGEMENTS.index(judgement) for judgement in COMBO_BREAKS]
+
+    counts = np.zeros((runs, len(JUDGEMENTS)), dtype=np.int64)
+    max_combos = np.zeros(runs, dtype=np.int64)
+    block_runs = max(1, BLOCK_JUDGEMENTS // max(total_notes, 1))
+    for start in range(0, runs, block_runs):
+        end = min(start + block_runs, runs)
+        draws = rng.random((end - start, total_notes), dtype=np.float32)
+        judgements = np.zeros(draws.shape, dtype=np.int8)
+        for idx in range(cum_probs.shape[1]):
+            judgements += draws >= cum_probs[:, idx]
+
+        for code in range(len(JUDGEMENTS)):
+            counts[start:end, code] = (judgements == code).sum(axis=1)
+        max_combos[start:end] = get_max_combos(
+            np.isin(judgements, break_codes))
+
+    results = {"score": get_score(counts @ np.array(NOTE_SCORE), max_combos,
+                                  total_notes),
+               "tp": get_tp(counts @ np.array(NOTE_TP), total_notes),
+               "max_combo": max_combos}
+    for code, judgement in enumerate(JUDGEMENTS):
+        results[judgement] = counts[:, code]
+    return results
+
+
+def summarize_scores(results: Dict[str, np.ndarray],
+                     percentiles: Tuple[int, ...] = SIM_PERCENTILES
+                     ) -> Dict[str, float]:
+    """
+        Mean, spread and percentiles of the simulated scores and TP, plus how
+        often the runs were full combos and million masters.
+    """
+    scores = results["score"]
+    full_combo = (results["bad"] == 0) & (results["miss"] == 0)
+    stats: Dict[str, float] = {
+        "runs": len(scores),
+        "avg_score": round(float(scores.mean()), 1),
+        "std_score": round(float(scores.std()), 1),
+    }
+    for pct, val in zip(percentiles, np.percentile(scores, percentiles)):
+        stats[f"p{pct}_score"] = int(val)
+
+    stats["avg_tp"] = round(float(results["tp"].mean()), 4)
+    stats["std_tp"] = round(float(results["tp"].std()), 4)
+    for pct, val in zip(percentiles, np.percentile(results["tp"], percentiles)):
+        stats[f"p{pct}_tp"] = round(float(val), 4)
+
+    stats["avg_max_combo"] = round(float(results["max_combo"].mean()), 1)
+    stats["fc_rate"] = round(float(full_combo.mean()), 4)
+    stats["mm_rate"] = round(float((full_combo & (results["good"] == 0))
+                                   .mean()), 4)
+    return stats
@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, List, Tuple
+
+# Every step of the analysis and the steps it needs to run first. The steps
+# in STAT_GROUPS are the ones that produce columns; the rest load what they
+# share (the song length, the note and page columns, the tempo map).
+STAT_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "music": (),
+    "columns": (),
+    "tempo_map": (),
+    "note_secs": ("columns", "tempo_map"),
+    "meta": (),
+    "length": ("music",),
+    "scan_line": ("columns", "tempo_map"),
+    "events": ("tempo_map",),
+    "note_counts": (),
+    "note_rates": ("note_counts", "columns", "tempo_map", "music"),
+    "peak_densities": ("columns", "note_secs"),
+    "page_stats": ("columns",),
+    "drag_chains": ("columns", "note_secs"),
+    "min_scores": ("note_counts",),
+    "strain": ("columns", "tempo_map", "note_secs"),
+    "movement": ("columns", "note_secs"),
+}
+STAT_GROUPS = ("meta", "length", "scan_line", "events", "note_counts",
+               "note_rates", "peak_densities", "page_stats", "drag_chains",
+               "min_scores", "strain", "movement")
+
+
+def resolve_steps(groups: Iterable[str]) -> List[str]:
+    """
+        Returns the given steps along with every step they depend on, with
+        each step after its dependencies.
+    """
+    steps: List[str] = []
+
+    def visit(step: str):
+        if step in steps:
+            return
+        if step not in STAT_DEPENDENCIES:
+            raise KeyError(f"{step} is not a stat group.")
+
+        for dependency in STAT_DEPENDENCIES[step]:
+            visit(dependency)
+        steps.append(step)
+
+    for group in groups:
+        visit(group)
+    return steps
@@ -0,0 +1,111 @@
+import math
+from typing import Dict
+
+import numpy as np
+
+from chart import NoteType
+
+# How much each note type strains on its own. Drag children just follow the
+# finger, so they add little.
+TYPE_WEIGHTS: Dict[NoteType, float] = {
+    NoteType.tap: 1.0,
+    NoteType.hold: 1.1,
+    NoteType.long_hold: 1.2,
+    NoteType.drag_head: 0.9,
+    NoteType.drag_child: 0.2,
+    NoteType.flick: 1.2,
+    NoteType.cdrag_head: 1.0,
+    NoteType.cdrag_child: 0.3,
+}
+# Share of strain left after a second without notes.
+STRAIN_DECAY = 0.3
+# Gaps are clamped to this, and notes closer than CHORD_GAP are hit together
+# (by two hands) so their x distance isn't movement.
+MIN_GAP = 0.05
+CHORD_GAP = 0.01
+MOVE_WEIGHT = 0.2
+# Pages shorter than REF_PAGE_SECS have a faster scan line, which makes the
+# notes on them harder to read, and longer ones easier.
+REF_PAGE_SECS = 2.0
+READ_EXPONENT = 0.3
+READ_FACTOR_RANGE = (0.5, 2.0)
+# The rating weighs the hardest sections most: the strain peak of every
+# section, sorted, with each one weighing PEAK_WEIGHT times the one before.
+SECTION_SECS = 0.4
+PEAK_WEIGHT = 0.9
+RATING_SCALE = 0.15
+# exp overflows past about 709, so the decaying sum restarts its reference
+# time every BLOCK_SECS.
+BLOCK_SECS = 30.0
+
+
+def decaying_sum(secs: np.ndarray, values: np.ndarray,
+                 decay: float = STRAIN_DECAY) -> np.ndarray:
+    """
+        For every note in the sorted secs, sums the values of it and all
+        notes before it, each scaled by decay per second since it came.
+
+        Within a block this is decay^t times a cumulative sum of
+        value * decay^-t, with t measured from the block start so it can't
+        overflow. The sum at the end of a block is carried into the next.
+    """
+    sums = np.empty(len(secs))
+    if len(secs) == 0:
+        return sums
+
+    rate = -math.log(decay)
+    starts = np.searchsorted(secs, np.arange(secs[0], secs[-1], BLOCK_SECS)
+                             + BLOCK_SECS, side="left")
+    bounds = np.unique(np.concatenate(([0], starts, [len(secs)])))
+    carry, carry_sec = 0.0, secs[0]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        rel_secs = secs[start:end] - secs[start]
+        block = np.exp(-rate * rel_secs) * \
+            np.cumsum(values[start:end] * np.exp(rate * rel_secs))
+        sums[start:end] = block + carry * np.exp(
+            -rate * (secs[start:end] - carry_sec))
+        carry, carry_sec = sums[end - 1], secs[end - 1]
+
+    return sums
+
+
+def get_strains(secs: np.ndarray, x: np.ndarray, note_type: np.ndarray,
+                page_secs: np.ndarray) -> np.ndarray:
+    """
+        Strain of every note, given the notes sorted by time along with the
+        length of the page each one is on. Each note adds its type weight,
+        raised by how fast it moves from the note before and by how fast the
+        scan line is, to a decaying sum.
+    """
+    type_weights = np.zeros(len(NoteType))
+    for nt, weight in TYPE_WEIGHTS.items():
+        type_weights[nt.value] = weight
+
+    gaps = np.diff(secs, prepend=-np.inf)
+    moves = np.abs(np.diff(x, prepend=x[:1]))
+    moves[gaps < CHORD_GAP] = 0
+    velocity = moves / np.maximum(gaps, MIN_GAP)
+
+    read_factors = np.ones(len(secs))
+    timed = page_secs > 0
+    read_factors[timed] = np.clip((REF_PAGE_SECS / page_secs[timed])
+                                  ** READ_EXPONENT, *READ_FACTOR_RANGE)
+
+    values = type_weights[note_type] * read_factors * \
+        (1 + MOVE_WEIGHT * velocity)
+    return decaying_sum(secs, values)
+
+
+def get_strain_rating(secs: np.ndarray, strains: np.ndarray) -> float:
+    """
+        Weighted sum of the strain peaks of every SECTION_SECS section, with
+        the hardest sections weighing the most.
+    """
+    if len(secs) == 0:
+        return 0.0
+
+    sections = np.floor((secs - secs[0]) / SECTION_SECS).astype(np.int64)
+    starts = np.flatnonzero(np.diff(sections, prepend=-1))
+    peaks = np.sort(np.maximum.reduceat(strains, starts))[::-1]
+    weights = PEAK_WEIGHT ** np.arange(len(peaks))
+    return float(np.sum(peaks * weights) * RATING_SCALE)
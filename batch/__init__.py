@@ -0,0 +1,5 @@
+from .journal import Journal
+from .memory import MemoryBudget, MemoryTracker, MemoryType
+from .pipeline import FAILED, Pipeline
+from .shard import ShardType, select_shard, shard_suffix
+from .tasks import BinWidthType, SourceType
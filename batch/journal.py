@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def _to_json(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{obj} is not JSON serializable.")
+
+
+class Journal:
+    """
+        Append-only record of which charts a run has finished (with their
+        results) and which ones failed, stored as one JSON object per line.
+        Opening an existing journal with resume loads its entries so that
+        finished charts can be skipped; otherwise it starts over.
+
+        With keep_results off, only the IDs of finished charts are kept in
+        memory and the results are read back from the file by iter_done.
+
+        options are the settings the results depend on. They're written as
+        the first line of a new journal, and resuming from a journal written
+        with other options (or none) raises a ValueError, so a run never
+        mixes results made with different settings.
+    """
+    def __init__(self, path: str, resume: bool = False,
+                 keep_results: bool = True, options: Optional[dict] = None):
+        self.path = path
+        self.keep_results = keep_results
+        # Compared in the form they're read back from the file in.
+        self.options = (None if options is None
+                        else json.loads(json.dumps(options, default=_to_json)))
+        self.done: Dict[str, Any] = dict()
+        self.failed: Dict[str, str] = dict()
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+
+        # A journal without any entries is just started over.
+        resume = resume and bool(self.done or self.failed)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a" if resume else "w", encoding="utf8")
+        if not resume and self.options is not None:
+            self._append({"options": self.options})
+
+    def _load(self):
+        options = None
+        with open(self.path, encoding="utf8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off if the run was killed.
+                    continue
+
+                if "options" in entry:
+                    options = entry["options"]
+                    continue
+
+                chart_id = entry["chart_id"]
+                if entry["status"] == "done":
+                    self.done[chart_id] = (entry.get("result")
+                                           if self.keep_results else None)
+                    self.failed.pop(chart_id, None)
+                else:
+                    self.failed[chart_id] = entry.get("error", "")
+
+        if (self.done or self.failed) and options != self.options:
+            raise ValueError(
+                f"Can't resume from {self.path}, it was written with other "
+                f"options ({options}, not {self.options}).")
+
+    def iter_done(self) -> Iterator[Tuple[str, Any]]:
+        """
+            Yields (chart ID, result) for every finished chart by reading the
+            journal file, one entry at a time.
+        """
+        if not self._file.closed:
+            self._file.flush()
+
+        seen = set()
+        with open(self.path, encoding="utf8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                if "options" in entry:
+                    continue
+
+                chart_id = entry["chart_id"]
+                if (entry["status"] == "done" and chart_id in self.done
+                        and chart_id not in seen):
+                    seen.add(chart_id)
+                    yield chart_id, entry.get("result")
+
+    def is_done(self, chart_id: str) -> bool:
+        return chart_id in self.done
+
+    def record_done(self, chart_id: str, result: Any = None):
+        with self._lock:
+            self.done[chart_id] = result if self.keep_results else None
+            self.failed.pop(chart_id, None)
+            self._append({"chart_id": chart_id, "status": "done",
+                          "result": result})
+
+    def record_failure(self, chart_id: str, error: BaseException):
+        message = f"{type(error).__name__}: {error}"
+        if error.__cause__ is not None:
+            message += f" ({type(error.__cause__).__name__}: {error.__cause__})"
+
+        with self._lock:
+            self.failed[chart_id] = message
+            self._append({"chart_id": chart_id, "status": "failed",
+                          "error": message})
+
+    def _append(self, entry: dict):
+        self._file.write(json.dumps(entry, default=_to_json) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'Journal':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import click
+
+import bundle
+from analysis.music import get_music_length
+from analysis.note_dist import MARGIN_PX, PX_PER_SEC
+from chart import LevelInfo
+
+T = TypeVar("T")
+V = TypeVar("V")
+
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+MEMORY_REGEX = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*$',
+                          re.IGNORECASE)
+
+# Measured with tracemalloc: a parsed chart and its columns take about six
+# times the size of the chart JSON.
+CHART_BYTES_PER_FILE_BYTE = 6
+# A note distribution figure is 1200 px high. The RGBA canvas and the PNG
+# encoder's copy of it take 8 bytes per pixel, on top of matplotlib's fixed
+# overhead.
+FIGURE_BYTES_PER_PX = 1200 * 8
+FIGURE_BASE_BYTES = 4 << 20
+
+
+class MemoryType(click.ParamType):
+    """
+        Click parameter for memory sizes such as 512M, 2G or 1.5GiB.
+    """
+    name = "memory"
+
+    def convert(self, value, param, ctx) -> int:
+        if isinstance(value, int):
+            return value
+
+        match = MEMORY_REGEX.match(value)
+        if match is None:
+            self.fail(f"{value} is not a memory size (e.g. 512M or 2G)",
+                      param, ctx)
+
+        return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def format_bytes(size: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def estimate_cost(src: str, chart_id: str, with_figure: bool = False,
+                  max_width: Optional[int] = None) -> int:
+    """
+        Estimates how many bytes loading and processing a chart takes, from
+        the size of its chart file and, for note distribution figures, the
+        length of its song (capped at max_width pixels wide).
+    """
+    level_json_path = os.path.join(src, chart_id, "level.json")
+    with bundle.open_file(level_json_path, encoding="utf8") as level_json_file:
+        level_info = LevelInfo.from_dict(json.load(level_json_file), src)
+
+    diff = level_info.charts[-1].name
+    level_paths = level_info.paths
+    cost = (bundle.getsize(level_paths["charts"][diff])
+            * CHART_BYTES_PER_FILE_BYTE)
+
+    if with_figure:
+        if "overrides" in level_paths:
+            music_path = level_paths["overrides"][diff]
+        else:
+            music_path = level_paths["music"]
+        width = get_music_length(music_path) * PX_PER_SEC + MARGIN_PX
+        if max_width is not None:
+            width = min(width, max_width)
+        cost += FIGURE_BASE_BYTES + int(width * FIGURE_BYTES_PER_PX)
+
+    return cost
+
+
+def estimate_costs(chart_ids: Iterable[str], estimate: Callable[[str], int],
+                   workers: int = 4) -> Dict[str, int]:
+    """
+        Estimates the cost of every chart on a thread pool. Charts whose files
+        can't be read get a cost of 0, so the error is reported by the run
+        itself.
+    """
+    def safe_estimate(chart_id: str) -> int:
+        try:
+            return estimate(chart_id)
+        except Exception:
+            return 0
+
+    chart_ids = list(chart_ids)
+    with ThreadPoolExecutor(workers) as executor:
+        return dict(zip(chart_ids, executor.map(safe_estimate, chart_ids)))
+
+
+def largest_first(chart_ids: Iterable[str], costs: Dict[str, int]) -> List[str]:
+    return sorted(chart_ids, key=lambda cid: costs.get(cid, 0), reverse=True)
+
+
+class MemoryBudget:
+    """
+        Counts the estimated bytes of the items in flight. An item can start
+        if it fits in what's left of the limit, or if nothing else is running,
+        so a single item larger than the limit still gets processed alone.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, cost: int) -> bool:
+        return self.used == 0 or self.used + cost <= self.limit
+
+    def try_acquire(self, cost: int) -> bool:
+        with self._cond:
+            if not self._fits(cost):
+                return False
+            self.used += cost
+            return True
+
+    def acquire(self, cost: int):
+        with self._cond:
+            self._cond.wait_for(lambda: self._fits(cost))
+            self.used += cost
+
+    def release(self, cost: int):
+        with self._cond:
+            self.used -= cost
+            self._cond.notify_all()
+
+
+class MemoryTracker:
+    """
+        Records the peak memory allocated while running each item, using
+        tracemalloc. tracemalloc sees the allocations of every thread, so
+        nothing else runs while an item is measured: work started through
+        run_other waits until the measurement is over, and a measurement
+        waits for the work already running to finish.
+
+        A peak is then what the item itself allocated on top of what was in
+        memory before it started. Only allocations made through Python's
+        allocators are seen (which includes numpy arrays), not native buffers
+        such as matplotlib's canvas. Items are measured one at a time.
+    """
+    def __init__(self):
+        self.peaks: Dict[str, int] = dict()
+        self._cond = threading.Condition()
+        self._measuring = False
+        self._running = 0
+
+    def run_other(self, func: Callable[..., V], *args) -> V:
+        with self._cond:
+            self._cond.wait_for(lambda: not self._measuring)
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def measure(self, key: str, func: Callable[..., V], *args) -> V:
+        with self._cond:
+            self._measuring = True
+            self._cond.wait_for(lambda: self._running == 0)
+        tracemalloc.start()
+        try:
+            return func(*args)
+        finally:
+            self.peaks[key] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with self._cond:
+                self._measuring = False
+                self._cond.notify_all()
+
+    def largest(self, count: int = 10) -> List[Tuple[str, int]]:
+        return sorted(self.peaks.items(), key=lambda x: x[1],
+                      reverse=True)[:count]
+
+
+def report_memory(tracker: MemoryTracker, costs: Dict[str, int],
+                  budget: Optional[int] = None, count: int = 10):
+    if not tracker.peaks:
+        return
+
+    total = sum(tracker.peaks.values())
+    click.echo(f"Peak memory per chart (avg. "
+               f"{format_bytes(total / len(tracker.peaks))}"
+               + (f", budget {format_bytes(budget)}" if budget else "")
+               + "), largest first:")
+    for chart_id, peak in tracker.largest(count):
+        click.echo(f"  {chart_id}: {format_bytes(peak)} "
+                   f"(estimated {format_bytes(costs.get(chart_id, 0))})")
@@ -0,0 +1,200 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (Any, Callable, Deque, Generic, Iterable, Iterator,
+                    Optional, Tuple, TypeVar)
+
+T = TypeVar("T")
+U = TypeVar("U")
+V = TypeVar("V")
+
+DEFAULT_IO_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 8
+_DONE = object()
+# Yielded as the result of items that failed, so every item is yielded once.
+FAILED = object()
+
+
+def _identity(x):
+    return x
+
+
+class Pipeline(Generic[T, U, V]):
+    """
+        Runs read -> compute -> write over a list of items with the stages
+        overlapping. read runs ahead on a thread pool (for file and audio
+        header I/O), compute runs in the calling thread in the original item
+        order, and write runs on its own thread. Both queues are bounded, so
+        at most queue_size items are held between any two stages.
+
+        If on_error is given, an item that fails in any stage is passed to it
+        along with the exception and skipped instead of stopping the run.
+        Items that fail before they're yielded are yielded with FAILED as
+        their result, so counting what run yields still counts every item.
+
+        If budget is given, each item holds cost(item) bytes of it from the
+        time its read starts until it's written (or yielded, without a write
+        stage), and no new reads start while the budget is used up. It needs
+        acquire, try_acquire and release methods taking a cost, like
+        batch.MemoryBudget.
+
+        If tracker is given, each compute runs through
+        tracker.measure(item, compute, value) and every read and write
+        through tracker.run_other(func, ...), so the tracker can keep them
+        apart (see batch.MemoryTracker).
+    """
+    def __init__(self, read: Callable[[T], U],
+                 compute: Callable[[U], V] = _identity,
+                 write: Optional[Callable[[T, V], None]] = None,
+                 io_workers: int = DEFAULT_IO_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 on_error: Optional[Callable[[T, Exception], None]] = None,
+                 cost: Optional[Callable[[T], int]] = None,
+                 budget: Optional[Any] = None,
+                 tracker: Optional[Any] = None):
+        self.read = read
+        self.compute = compute
+        self.write = write
+        self.io_workers = io_workers
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.cost = cost
+        self.budget = budget
+        self.tracker = tracker
+
+    def run(self, items: Iterable[T]) -> Iterator[Tuple[T, V]]:
+        """
+            Yields (item, computed result) pairs as compute finishes them.
+            An exception in any stage stops the pipeline and is re-raised
+            here.
+        """
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_errors = []
+        writer = None
+        if self.write is not None:
+            writer = threading.Thread(target=self._write_loop,
+                                      args=(write_queue, write_errors),
+                                      daemon=True)
+            writer.start()
+
+        pending: Deque[Tuple[T, Future, int]] = deque()
+        item_it = _Peekable(iter(items))
+        try:
+            with ThreadPoolExecutor(self.io_workers) as executor:
+                try:
+                    self._fill(executor, item_it, pending)
+                    while pending:
+                        item, future, cost = pending.popleft()
+                        try:
+                            result = self._compute(item, future.result())
+                        except Exception as err:
+                            self._release(cost)
+                            if self.on_error is None:
+                                raise
+                            self.on_error(item, err)
+                            self._fill(executor, item_it, pending)
+                            yield item, FAILED
+                            continue
+
+                        # Hand the item's budget on before filling, since
+                        # filling may have to wait for it.
+                        if writer is not None:
+                            self._put(write_queue, (item, result, cost),
+                                      write_errors)
+                        else:
+                            self._release(cost)
+                        self._fill(executor, item_it, pending)
+                        yield item, result
+                except BaseException:
+                    for _, future, cost in pending:
+                        future.cancel()
+                        self._release(cost)
+                    raise
+        finally:
+            if writer is not None:
+                self._put(write_queue, _DONE, write_errors, check=False)
+                writer.join()
+
+        if write_errors:
+            raise write_errors[0]
+
+    def _read(self, item: T) -> U:
+        if self.tracker is None:
+            return self.read(item)
+        return self.tracker.run_other(self.read, item)
+
+    def _compute(self, item: T, value: U) -> V:
+        if self.tracker is None:
+            return self.compute(value)
+        return self.tracker.measure(item, self.compute, value)
+
+    def _write(self, item: T, result: V):
+        if self.tracker is None:
+            self.write(item, result)
+        else:
+            self.tracker.run_other(self.write, item, result)
+
+    def _fill(self, executor: ThreadPoolExecutor, item_it: '_Peekable',
+              pending: Deque[Tuple[T, Future, int]]):
+        while len(pending) < self.queue_size:
+            item = item_it.peek()
+            if item is _DONE:
+                return
+
+            cost = 0
+            if self.budget is not None:
+                cost = self.cost(item) if self.cost is not None else 0
+                if not pending:
+                    # Nothing left to compute, so wait for the writer to
+                    # free up some of the budget.
+                    self.budget.acquire(cost)
+                elif not self.budget.try_acquire(cost):
+                    return
+
+            next(item_it)
+            pending.append((item, executor.submit(self._read, item), cost))
+
+    def _release(self, cost: int):
+        if self.budget is not None:
+            self.budget.release(cost)
+
+    def _write_loop(self, write_queue: queue.Queue, write_errors: list):
+        while True:
+            entry = write_queue.get()
+            if entry is _DONE:
+                return
+
+            item, result, cost = entry
+            if not write_errors:
+                try:
+                    self._write(item, result)
+                except Exception as err:
+                    if self.on_error is None:
+                        write_errors.append(err)
+                    else:
+                        self.on_error(item, err)
+
+            del entry, result
+            self._release(cost)
+
+    @staticmethod
+    def _put(write_queue: queue.Queue, entry, write_errors: list,
+             check: bool = True):
+        if check and write_errors:
+            raise write_errors[0]
+        write_queue.put(entry)
+
+
+class _Peekable:
+    def __init__(self, it: Iterator):
+        self._it = it
+        self._next = next(it, _DONE)
+
+    def peek(self):
+        return self._next
+
+    def __next__(self):
+        item = self._next
+        self._next = next(self._it, _DONE)
+        return item
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List
+
+import bundle
+
+
+def settings_hash(settings: dict) -> str:
+    encoded = json.dumps(settings, sort_keys=True).encode("utf8")
+    return hashlib.md5(encoded).hexdigest()
+
+
+def fingerprint(paths: List[str]) -> Dict[str, List[int]]:
+    """
+        Size and modification time of every input file. Files that don't
+        exist are left out, so they show up as changed once they do.
+    """
+    prints = dict()
+    for path in paths:
+        try:
+            stat = bundle.stat(path)
+        except OSError:
+            continue
+        prints[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns]
+    return prints
+
+
+class RenderCache:
+    """
+        Remembers the input fingerprints and the renderer settings that every
+        output was drawn with, stored as one JSON file next to the outputs.
+        An output is fresh if every file drawn for it still exists, its
+        inputs have the same fingerprints, and it was drawn with the same
+        settings.
+    """
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.settings_hash = settings_hash(settings)
+        self.entries: Dict[str, dict] = dict()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf8") as cache_file:
+                    self.entries = json.load(cache_file)
+            except ValueError:
+                self.entries = dict()
+
+    def is_fresh(self, key: str, inputs: Dict[str, List[int]]) -> bool:
+        entry = self.entries.get(key)
+        return (entry is not None and entry.get("outputs")
+                and all(os.path.exists(output) for output in entry["outputs"])
+                and entry["settings"] == self.settings_hash
+                and entry["inputs"] == inputs)
+
+    def record(self, key: str, inputs: Dict[str, List[int]],
+               outputs: List[str]):
+        with self._lock:
+            self.entries[key] = {"settings": self.settings_hash,
+                                 "inputs": inputs, "outputs": outputs}
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf8") as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(tmp_path, self.path)
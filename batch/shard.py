@@ -0,0 +1,48 @@
+import hashlib
+from typing import List, Optional, Tuple
+
+import click
+
+Shard = Tuple[int, int]
+
+
+class ShardType(click.ParamType):
+    """
+        Click parameter for shards written as i/N, where i counts from 1.
+    """
+    name = "shard"
+
+    def convert(self, value, param, ctx) -> Shard:
+        if isinstance(value, tuple):
+            return value
+
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            self.fail(f"{value} is not written as i/N (e.g. 1/4)", param, ctx)
+
+        if not 1 <= index <= count:
+            self.fail(f"{value} must have 1 <= i <= N", param, ctx)
+
+        return index, count
+
+
+def in_shard(chart_id: str, shard: Shard) -> bool:
+    """
+        Puts a chart in a shard based on a hash of its ID, so every machine
+        picks the same charts no matter what order they are listed in.
+    """
+    index, count = shard
+    digest = hashlib.md5(chart_id.encode("utf8")).digest()
+    return int.from_bytes(digest[:8], "little") % count == index - 1
+
+
+def select_shard(chart_ids: List[str], shard: Optional[Shard]) -> List[str]:
+    if shard is None:
+        return list(chart_ids)
+
+    return [cid for cid in chart_ids if in_shard(cid, shard)]
+
+
+def shard_suffix(shard: Shard) -> str:
+    return f"shard-{shard[0]}-of-{shard[1]}"
@@ -0,0 +1,210 @@
+import io
+import json
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+
+import bundle
+from analysis import Analyzer, AccuracyModel, NoteDistPlotter, simulate_scores
+from analysis.note_dist import (DEFAULT_BIN_WIDTH, BinWidth, get_bin_layout,
+                                parse_bin_width)
+from analysis.score import summarize_scores
+from chart import ChartColumns
+from corpus import Catalog, Level
+
+
+def load_analyzer(src: str, chart_id: str, windows: Tuple[float, ...],
+                  stats: Optional[Iterable[str]] = None,
+                  catalog: Optional[Catalog] = None) -> Analyzer:
+    """
+        With a catalog, the level comes from it and its paths aren't checked
+        on disk again.
+    """
+    level_info = None
+    if catalog is not None:
+        level_info = catalog.valid_level_info(chart_id)
+    analyzer = Analyzer(src, chart_id, windows, stats, level_info)
+    if analyzer.needs("music"):
+        analyzer.load_music()
+    return analyzer
+
+
+def run_analyzer(analyzer: Analyzer,
+                 columns: Optional[Set[str]] = None) -> Tuple[Analyzer, dict]:
+    analyzer.start()
+    stats = analyzer.get_stats_as_json()
+    if columns is not None:
+        stats = {key: val for key, val in stats.items() if key in columns}
+    return analyzer, stats
+
+
+def write_timelines(timeline_dir: str, chart_id: str, analyzer: Analyzer):
+    tables = {
+        "scan_line": analyzer.get_scan_line_timeline(),
+        "events": analyzer.get_event_timeline(),
+        "pages": analyzer.get_page_table(),
+    }
+    for name, table in tables.items():
+        table_path = os.path.join(timeline_dir, f"{chart_id}.{name}.csv")
+        pd.DataFrame(table).to_csv(table_path, index=False)
+
+
+def get_input_paths(src: str, chart_id: str) -> List[str]:
+    """
+        The files a chart's outputs are made from: its level.json, and the
+        chart and song of the difficulty that gets analyzed.
+    """
+    level_json_path = os.path.join(src, chart_id, "level.json")
+    try:
+        level = Level(src, chart_id)
+        return [level_json_path,
+                level.info.paths["charts"][level.chart_info().name],
+                level.music_path()]
+    except Exception:
+        return [level_json_path]
+
+
+class BinWidthType(click.ParamType):
+    """
+        Click parameter for note dist bin widths such as 250ms, 0.5s, beat
+        or page.
+    """
+    name = "bin width"
+
+    def convert(self, value, param, ctx) -> BinWidth:
+        if isinstance(value, float):
+            return value
+
+        try:
+            return parse_bin_width(value)
+        except ValueError as err:
+            self.fail(str(err), param, ctx)
+
+
+def load_dist_plotter(src: str, chart_id: str,
+                      catalog: Optional[Catalog] = None) -> NoteDistPlotter:
+    level_info = None
+    if catalog is not None:
+        level_info = catalog.valid_level_info(chart_id)
+    return NoteDistPlotter(src, chart_id, level_info)
+
+
+class SourceType(click.ParamType):
+    """
+        Click parameter for folders that may be inside a zip or tar archive,
+        like pack.zip/levels, or are the archive itself. With files, files
+        are accepted as well.
+    """
+    name = "path"
+
+    def __init__(self, files: bool = False):
+        self.files = files
+
+    def convert(self, value, param, ctx) -> str:
+        if bundle.isdir(value) or (self.files and bundle.isfile(value)):
+            return value
+
+        kind = "a file, a folder" if self.files else "a folder"
+        self.fail(f"{value} isn't {kind}, an archive or a folder inside one",
+                  param, ctx)
+
+
+def render_dist(dist_plotter: NoteDistPlotter,
+                peak_window: Optional[float] = None,
+                max_width: Optional[int] = None, agg: str = "max",
+                tiles: bool = False, heatmap: bool = False,
+                bin_width: BinWidth = DEFAULT_BIN_WIDTH) -> Dict[str, bytes]:
+    """
+        Renders a note dist as PNG images keyed by file name suffix: "" for
+        the whole song, squeezed into max_width pixels by putting several
+        bins in one bar if needed, and ".tile-NN" for full detail tiles of
+        that width when tiles is set and the song doesn't fit. With heatmap,
+        the note positions are drawn to ".heatmap" as well.
+    """
+    dist_plotter.count_notes(bin_width)
+    bin_count = dist_plotter.bin_count
+    bar_bins, tile_bins = get_bin_layout(bin_count, max_width)
+
+    def render(**kwargs) -> bytes:
+        with io.BytesIO() as image:
+            dist_plotter.plot_counts(image, peak_window, max_width=max_width,
+                                     **kwargs)
+            return image.getvalue()
+
+    images = {"": render(bar_bins=bar_bins, agg=agg)}
+    if tiles and bar_bins > 1:
+        # Tiles are cut by bin, so every one of them has bins to draw.
+        for idx, start_bin in enumerate(range(0, bin_count, tile_bins), 1):
+            end_bin = min(start_bin + tile_bins, bin_count)
+            images[f".tile-{idx:02}"] = render(start_bin=start_bin,
+                                               end_bin=end_bin)
+    if heatmap:
+        # The heatmap has one column per second, whatever the bin width.
+        heatmap_secs, _ = get_bin_layout(dist_plotter.music_length,
+                                         max_width)
+        with io.BytesIO() as image:
+            dist_plotter.plot_heatmap(image, heatmap_secs, max_width)
+            images[".heatmap"] = image.getvalue()
+    return images
+
+
+def count_dist(dist_plotter: NoteDistPlotter,
+               bin_width: BinWidth = DEFAULT_BIN_WIDTH) -> Dict[str, np.ndarray]:
+    dist_plotter.count_notes(bin_width)
+    return dist_plotter.get_bin_table()
+
+
+def write_bin_table(path: str, table: Dict[str, np.ndarray]):
+    """
+        Saves binned note counts as CSV, or as a structured .npy array with
+        one field per column.
+    """
+    if path.endswith(".npy"):
+        array = np.zeros(len(table["start_sec"]),
+                         dtype=[(key, np.float64) for key in table])
+        for key, column in table.items():
+            array[key] = column
+        np.save(path, array)
+    else:
+        pd.DataFrame(table).to_csv(path, index=False)
+
+
+def write_file(path: str, data: bytes):
+    with open(path, "wb") as out_file:
+        out_file.write(data)
+
+
+def load_note_types(src: str, chart_id: str) -> np.ndarray:
+    """
+        Type codes of the notes of the chart that gets analyzed, in the order
+        they're hit. The chart JSON is read straight into columns.
+    """
+    level = Level(src, chart_id)
+    chart_path = level.info.paths["charts"][level.chart_info().name]
+    try:
+        with bundle.open_file(chart_path, encoding="utf8") as chart_file:
+            notes = ChartColumns.from_dict(json.load(chart_file)).notes
+    except Exception as err:
+        raise Exception(
+            f"There's something wrong with {chart_id}'s chart."
+        ) from err
+
+    return notes.note_type[np.argsort(notes.tick, kind="stable")]
+
+
+def simulate_chart(chart_id: str, note_type: np.ndarray, model: AccuracyModel,
+                   runs: int, seed: Optional[int] = None) -> dict:
+    """
+        Simulates a chart and summarizes the runs. With a seed, every chart
+        gets its own stream of draws from it, so results don't depend on
+        which other charts are simulated.
+    """
+    rng = np.random.default_rng(
+        None if seed is None else [seed, zlib.crc32(chart_id.encode())])
+    stats = {"model": model.name, "total_notes": len(note_type)}
+    stats.update(summarize_scores(simulate_scores(note_type, model, runs, rng)))
+    return stats
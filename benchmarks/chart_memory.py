@@ -0,0 +1,80 @@
+"""
+    Measures how much memory a parsed chart takes, for the chart model
+    classes and for the columnar ChartColumns, over a large synthetic chart.
+
+        python -m benchmarks.chart_memory [note_count]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from chart import Chart, ChartColumns
+
+TIME_BASE = 480
+
+
+def make_chart(note_count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    page_ticks = TIME_BASE * 2
+    page_count = note_count // 8 + 1
+    pages = [{"start_tick": idx * page_ticks,
+              "end_tick": (idx + 1) * page_ticks,
+              "scan_line_direction": 1 if idx % 2 else -1}
+             for idx in range(page_count)]
+    tempos = [{"tick": idx * page_ticks * 16,
+               "value": rng.choice([400000, 500000, 600000])}
+              for idx in range(page_count // 16 + 1)]
+    events = [{"tick": tempo["tick"],
+               "event_list": [{"type": idx % 2, "args": "W"}]}
+              for idx, tempo in enumerate(tempos[1:])]
+    notes = [{"page_index": idx // 8,
+              "type": rng.randrange(8),
+              "id": idx,
+              "tick": idx * page_ticks // 8,
+              "x": round(rng.random(), 3),
+              "hold_tick": 0,
+              "next_id": 0}
+             for idx in range(note_count)]
+
+    return {"format_version": 1, "time_base": TIME_BASE,
+            "start_offset_time": 0.0, "page_list": pages,
+            "tempo_list": tempos, "event_order_list": events,
+            "note_list": notes}
+
+
+def measure(label: str, parse, chart_dict: dict):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    parsed = parse(chart_dict)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    note_count = len(chart_dict["note_list"])
+    print(f"{label:<14} {current / 2 ** 20:8.2f} MiB "
+          f"({current / note_count:6.1f} B/note), "
+          f"peak {peak / 2 ** 20:8.2f} MiB, {elapsed * 1000:8.1f} ms")
+    return parsed
+
+
+def main():
+    note_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    chart_dict = make_chart(note_count)
+    print(f"Synthetic chart with {note_count} notes")
+
+    chart = measure("Chart", Chart.from_dict, chart_dict)
+    measure("ChartColumns", ChartColumns.from_dict, chart_dict)
+
+    start = time.perf_counter()
+    total = 0
+    for note in chart.note_list:
+        total += note.tick
+    elapsed = time.perf_counter() - start
+    print(f"Attribute loop over note.tick: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+from .bundle import (ARCHIVE_EXTS, copy_file, exists, getsize, is_archive,
+                     isdir, isfile, open_file, scandir, split_path, stat)
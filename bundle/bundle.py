@@ -0,0 +1,331 @@
+import io
+import os
+import posixpath
+import shutil
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Dict, IO, List, NamedTuple, Optional, Tuple, Union
+
+ARCHIVE_EXTS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
+                ".tar.xz", ".txz")
+# A zip local file header is 30 bytes, with the lengths of the file name and
+# extra field at 26 and 28.
+ZIP_HEADER = struct.Struct("<26xHH")
+COPY_BUFFER = 1 << 20
+
+
+class Stat(NamedTuple):
+    st_size: int
+    st_mtime: float
+    st_mtime_ns: int
+
+
+class Member(NamedTuple):
+    size: int
+    mtime_ns: int
+    is_dir: bool
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_EXTS) and os.path.isfile(path)
+
+
+def _member_name(name: str) -> str:
+    # Tars made from "." name their members ./level/..., which is the same
+    # place as level/...
+    name = posixpath.normpath(name.lstrip("/"))
+    return "" if name == "." else name
+
+
+def split_path(path: str) -> Tuple[Optional[str], str]:
+    """
+        Splits a path that goes into an archive (e.g. pack.zip/level/chart.txt)
+        into the archive and the member inside it. Paths outside of archives
+        give None and the path itself.
+    """
+    head, parts = path, []
+    while True:
+        # Only names that look like archives are checked on disk, so plain
+        # paths cost no system calls.
+        if head.lower().endswith(ARCHIVE_EXTS) and os.path.isfile(head):
+            return head, "/".join(reversed(parts))
+
+        new_head, tail = os.path.split(head)
+        if new_head == head or not tail:
+            return None, path
+        parts.append(tail)
+        head = new_head
+
+
+class _MemberView(io.RawIOBase):
+    """
+        Reads size bytes starting at offset of a file with its own handle, so
+        members stored without compression can be seeked like a file.
+    """
+    def __init__(self, path: str, offset: int, size: int):
+        self._file = open(path, "rb")
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._size
+        self._pos = max(pos, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        count = max(min(len(buffer), self._size - self._pos), 0)
+        if count == 0:
+            return 0
+
+        self._file.seek(self._offset + self._pos)
+        data = self._file.read(count)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class Archive:
+    """
+        Index of the members of a zip or tar file, read once when opened.
+        Folders that only show up in member names are listed as well.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        archive_stat = os.stat(path)
+        self.mtime_ns = archive_stat.st_mtime_ns
+        self.size = archive_stat.st_size
+        self.members: Dict[str, Member] = {"": Member(0, self.mtime_ns, True)}
+        self.children: Dict[str, Dict[str, bool]] = {"": dict()}
+        self._lock = threading.Lock()
+
+        if zipfile.is_zipfile(path):
+            self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(path)
+            self._tar: Optional[tarfile.TarFile] = None
+            self._infos = {_member_name(info.filename): info
+                           for info in self._zip.infolist()}
+            for name, info in self._infos.items():
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                self._add(name, Member(info.file_size, int(mtime * 1e9),
+                                       info.is_dir()))
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path)
+            # Plain tars keep members as they are, so they can be read in
+            # place; compressed ones come through a decompressing stream.
+            self._in_place = isinstance(self._tar.fileobj, io.BufferedReader)
+            self._infos = {_member_name(info.name): info
+                           for info in self._tar.getmembers()}
+            for name, info in self._infos.items():
+                self._add(name, Member(info.size, int(info.mtime * 1e9),
+                                       info.isdir()))
+
+    def _add(self, name: str, member: Member):
+        if not name:
+            return
+
+        self.members[name] = member
+        parent, _, base = name.rpartition("/")
+        while True:
+            self.children.setdefault(parent, dict())[base] = member.is_dir
+            if member.is_dir:
+                self.children.setdefault(name, dict())
+            if parent in self.members:
+                return
+
+            name, member = parent, Member(0, self.mtime_ns, True)
+            self.members[name] = member
+            parent, _, base = name.rpartition("/")
+
+    def _file_info(self, member: str):
+        info = self._infos.get(member)
+        if info is None or self.members[member].is_dir:
+            raise FileNotFoundError(f"{member} isn't a file in {self.path}")
+        return info
+
+    def open(self, member: str) -> BinaryIO:
+        info = self._file_info(member)
+        if self._zip is not None:
+            if info.compress_type == zipfile.ZIP_STORED:
+                with open(self.path, "rb") as zip_file:
+                    zip_file.seek(info.header_offset)
+                    name_len, extra_len = ZIP_HEADER.unpack(
+                        zip_file.read(ZIP_HEADER.size))
+                offset = info.header_offset + ZIP_HEADER.size + \
+                    name_len + extra_len
+                return io.BufferedReader(
+                    _MemberView(self.path, offset, info.file_size))
+            return self._zip.open(info)
+
+        if self._in_place:
+            return io.BufferedReader(
+                _MemberView(self.path, info.offset_data, info.size))
+
+        # Compressed tars can only be read in order, one member at a time.
+        with self._lock:
+            return io.BytesIO(self._tar.extractfile(info).read())
+
+    def copy(self, member: str, dest_file: BinaryIO):
+        """
+            Writes a member to dest_file. Members of compressed tars are
+            streamed instead of being read into memory whole like open does.
+        """
+        info = self._file_info(member)
+        if self._tar is not None and not self._in_place:
+            with self._lock:
+                shutil.copyfileobj(self._tar.extractfile(info), dest_file,
+                                   COPY_BUFFER)
+            return
+
+        with self.open(member) as src_file:
+            shutil.copyfileobj(src_file, dest_file, COPY_BUFFER)
+
+
+_archives: Dict[str, Archive] = dict()
+_archives_lock = threading.Lock()
+
+
+def _get_archive(path: str) -> Archive:
+    """
+        Opened archives are kept and reused until the file changes.
+    """
+    archive_stat = os.stat(path)
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None or archive.mtime_ns != archive_stat.st_mtime_ns \
+                or archive.size != archive_stat.st_size:
+            archive = _archives[path] = Archive(path)
+        return archive
+
+
+def _find(path: str) -> Tuple[Optional[Archive], str]:
+    archive_path, member = split_path(path)
+    if archive_path is None:
+        return None, path
+    return _get_archive(archive_path), member
+
+
+def open_file(path: str, mode: str = "r",
+              encoding: Optional[str] = None) -> IO:
+    """
+        Opens a file like open, except that files inside archives can be
+        read as well.
+    """
+    archive, member = _find(path)
+    if archive is None:
+        return open(path, mode, encoding=encoding)
+
+    if any(flag in mode for flag in "wax+"):
+        raise OSError(f"Can't write to {path}, it's inside an archive.")
+    member_file = archive.open(member)
+    if "b" in mode:
+        return member_file
+    return io.TextIOWrapper(member_file, encoding=encoding)
+
+
+def exists(path: str) -> bool:
+    archive, member = _find(path)
+    if archive is None:
+        return os.path.exists(path)
+    return member in archive.members
+
+
+def isfile(path: str) -> bool:
+    archive, member = _find(path)
+    if archive is None:
+        return os.path.isfile(path)
+    return member in archive.members and not archive.members[member].is_dir
+
+
+def isdir(path: str) -> bool:
+    archive, member = _find(path)
+    if archive is None:
+        return os.path.isdir(path)
+    return member in archive.members and archive.members[member].is_dir
+
+
+def stat(path: str) -> Union[os.stat_result, Stat]:
+    archive, member = _find(path)
+    if archive is None:
+        return os.stat(path)
+    if member not in archive.members:
+        raise FileNotFoundError(f"{member} isn't in {archive.path}")
+
+    info = archive.members[member]
+    return Stat(info.size, info.mtime_ns / 1e9, info.mtime_ns)
+
+
+def getsize(path: str) -> int:
+    return stat(path).st_size
+
+
+class Entry:
+    """
+        Stands in for os.DirEntry for the members of an archive folder.
+    """
+    def __init__(self, path: str, name: str, archive: Archive, member: str):
+        self.path = path
+        self.name = name
+        self._info = archive.members[member]
+
+    def is_dir(self) -> bool:
+        return self._info.is_dir
+
+    def is_file(self) -> bool:
+        return not self._info.is_dir
+
+    def stat(self) -> Stat:
+        return Stat(self._info.size, self._info.mtime_ns / 1e9,
+                    self._info.mtime_ns)
+
+
+def scandir(path: str) -> List[Union[os.DirEntry, Entry]]:
+    """
+        Lists a folder like os.scandir. Folders inside archives give Entry
+        objects, whose folders have the archive's mtime.
+    """
+    archive, member = _find(path)
+    if archive is None:
+        with os.scandir(path) as dir_items:
+            return list(dir_items)
+
+    if not isdir(path):
+        raise NotADirectoryError(f"{member} isn't a folder in {archive.path}")
+    prefix = f"{member}/" if member else ""
+    return [Entry(os.path.join(path, name), name, archive, prefix + name)
+            for name in archive.children.get(member, dict())]
+
+
+def copy_file(src: str, dest: str):
+    """
+        Copies a file like shutil.copy2, from an archive or not. Files from
+        archives get the modification time of their member.
+    """
+    archive, member = _find(src)
+    if archive is None:
+        shutil.copy2(src, dest)
+        return
+
+    with open(dest, "wb") as dest_file:
+        archive.copy(member, dest_file)
+    mtime_ns = archive.members[member].mtime_ns
+    os.utime(dest, ns=(mtime_ns, mtime_ns))
@@ -1,3 +1,5 @@
-from .chart import Chart
+from .chart import Chart, Event, EventOrder, Note, Page, Tempo
+from .columns import (ChartColumns, EventColumns, NoteColumns, PageColumns,
+                      TempoColumns, TempoMap)
 from .enums import EventArgs, EventType, NoteType, ScanLineDirection
 from .level_info import LevelInfo
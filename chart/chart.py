@@ -8,6 +8,7 @@ from .type_helper import (from_bool, from_float, from_int, from_list,
 
 @dataclass
 class Event:
+    __slots__ = ("evt_type", "evt_args")
     evt_type: EventType
     evt_args: EventArgs
 
@@ -27,6 +28,7 @@ class Event:
 
 @dataclass
 class EventOrder:
+    __slots__ = ("tick", "event_list")
     tick: int
     event_list: List[Event]
 
@@ -46,6 +48,8 @@ class EventOrder:
 
 @dataclass
 class Note:
+    __slots__ = ("page_index", "note_type", "note_id", "tick", "x",
+                 "hold_tick", "next_id")
     page_index: int
     note_type: NoteType
     note_id: int
@@ -54,6 +58,10 @@ class Note:
     hold_tick: int
     next_id: int
 
+    @property
+    def type_code(self) -> int:
+        return self.note_type.value
+
     @staticmethod
     def from_dict(obj: Any) -> 'Note':
         assert isinstance(obj, dict), "Object is not a dict."
@@ -80,6 +88,7 @@ class Note:
 
 @dataclass
 class Tempo:
+    __slots__ = ("tick", "value", "bpm")
     tick: int
     value: int
 
@@ -102,6 +111,7 @@ class Tempo:
 
 @dataclass
 class Page:
+    __slots__ = ("start_tick", "end_tick", "scan_line_direction", "ticks")
     start_tick: int
     end_tick: int
     scan_line_direction: ScanLineDirection
@@ -0,0 +1,286 @@
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Union
+
+import numpy as np
+
+from .chart import Chart
+from .enums import EventArgs
+
+EVENT_ARGS = list(EventArgs)
+EVENT_ARG_VALUES = [evt_args.value for evt_args in EventArgs]
+EVENT_ARG_INDEX = {evt_args: idx
+                   for idx, evt_args in enumerate(EVENT_ARGS)}
+EVENT_ARG_VALUE_INDEX = {value: idx
+                         for idx, value in enumerate(EVENT_ARG_VALUES)}
+
+
+@dataclass
+class NoteColumns:
+    page_index: np.ndarray
+    note_type: np.ndarray
+    note_id: np.ndarray
+    tick: np.ndarray
+    x: np.ndarray
+    hold_tick: np.ndarray
+    next_id: np.ndarray
+    # Whether x was written as an integer in the chart JSON, so to_dict can
+    # write it back the same way.
+    int_x: np.ndarray
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'NoteColumns':
+        notes = chart.note_list
+        return NoteColumns(
+            np.array([n.page_index for n in notes], dtype=np.int32),
+            np.array([n.type_code for n in notes], dtype=np.int8),
+            np.array([n.note_id for n in notes], dtype=np.int32),
+            np.array([n.tick for n in notes], dtype=np.int64),
+            np.array([n.x for n in notes], dtype=np.float64),
+            np.array([n.hold_tick for n in notes], dtype=np.int64),
+            np.array([n.next_id for n in notes], dtype=np.int32),
+            np.zeros(len(notes), dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.tick)
+
+
+@dataclass
+class PageColumns:
+    start_tick: np.ndarray
+    end_tick: np.ndarray
+    scan_line_direction: np.ndarray
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'PageColumns':
+        pages = chart.page_list
+        return PageColumns(
+            np.array([p.start_tick for p in pages], dtype=np.int64),
+            np.array([p.end_tick for p in pages], dtype=np.int64),
+            np.array([p.scan_line_direction.value for p in pages],
+                     dtype=np.int8),
+        )
+
+    @property
+    def ticks(self) -> np.ndarray:
+        return self.end_tick - self.start_tick
+
+    def __len__(self) -> int:
+        return len(self.start_tick)
+
+
+@dataclass
+class TempoColumns:
+    tick: np.ndarray
+    value: np.ndarray
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'TempoColumns':
+        tempos = chart.tempo_list
+        return TempoColumns(
+            np.array([t.tick for t in tempos], dtype=np.int64),
+            np.array([t.value for t in tempos], dtype=np.int64),
+        )
+
+    @property
+    def bpm(self) -> np.ndarray:
+        return 6e7 / self.value
+
+    def __len__(self) -> int:
+        return len(self.tick)
+
+
+@dataclass
+class EventColumns:
+    tick: np.ndarray
+    evt_type: np.ndarray
+    evt_args: np.ndarray
+    # Index of the event order each event came from, since several orders
+    # can share a tick.
+    order: np.ndarray
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'EventColumns':
+        """
+            Flattens every event of every event order into one row. The
+            arguments are stored as their index in EventArgs.
+        """
+        orders = chart.event_order_list
+        return EventColumns.from_orders(
+            np.fromiter((order.tick for order in orders), dtype=np.int64,
+                        count=len(orders)),
+            [order.event_list for order in orders],
+            lambda evt: evt.evt_type.value,
+            lambda evt: EVENT_ARG_INDEX[evt.evt_args])
+
+    @staticmethod
+    def from_orders(order_ticks: np.ndarray, event_lists: List[list],
+                    get_type: Callable[[Any], int],
+                    get_args: Callable[[Any], int]) -> 'EventColumns':
+        """
+            Builds the columns from the tick and event list of every event
+            order. Each column is filled straight from the events, without
+            making a row per event first.
+        """
+        counts = np.fromiter((len(event_list) for event_list in event_lists),
+                             dtype=np.int64, count=len(event_lists))
+        total = int(counts.sum())
+        order = np.repeat(np.arange(len(event_lists), dtype=np.int32), counts)
+        return EventColumns(
+            order_ticks[order],
+            np.fromiter((get_type(evt) for event_list in event_lists
+                         for evt in event_list), dtype=np.int8, count=total),
+            np.fromiter((get_args(evt) for event_list in event_lists
+                         for evt in event_list), dtype=np.int8, count=total),
+            order,
+        )
+
+    def __len__(self) -> int:
+        return len(self.tick)
+
+
+class TempoMap:
+    """
+        Converts ticks to seconds for a whole batch at once. The microseconds
+        elapsed at every tempo change are precomputed, so each conversion is a
+        single searchsorted over the tempo ticks.
+    """
+    def __init__(self, time_base: int, tempos: TempoColumns):
+        self.time_base = time_base
+        self.tempos = tempos
+
+        spans = np.diff(tempos.tick) / time_base * tempos.value[:-1]
+        self.start_us = np.concatenate(([0.0], np.cumsum(spans)))
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'TempoMap':
+        return TempoMap(chart.time_base, TempoColumns.from_chart(chart))
+
+    def to_sec(self, ticks: Union[np.ndarray, int]) -> np.ndarray:
+        ticks = np.asarray(ticks)
+        idx = np.searchsorted(self.tempos.tick, ticks, side="right") - 1
+        idx = np.clip(idx, 0, None)
+
+        us = (self.start_us[idx] + (ticks - self.tempos.tick[idx])
+              / self.time_base * self.tempos.value[idx])
+        return us / 1e6
+
+    def to_tick(self, secs: Union[np.ndarray, float]) -> np.ndarray:
+        """
+            The inverse of to_sec, as fractional ticks.
+        """
+        us = np.asarray(secs) * 1e6
+        idx = np.searchsorted(self.start_us, us, side="right") - 1
+        idx = np.clip(idx, 0, None)
+
+        return self.tempos.tick[idx] + ((us - self.start_us[idx])
+                                        / self.tempos.value[idx]
+                                        * self.time_base)
+
+
+def _column(rows: list, key: str, dtype: type) -> np.ndarray:
+    return np.array([row[key] for row in rows], dtype=dtype)
+
+
+@dataclass
+class ChartColumns:
+    """
+        A whole chart stored as columns. from_dict and to_dict work on the raw
+        chart JSON directly, skipping the per-object checks of Chart, so
+        charts can be read, transformed and written back in bulk. Writing
+        back an untransformed chart gives the same JSON values, except that
+        event orders without any events are dropped.
+    """
+    format_version: int
+    time_base: int
+    start_offset_time: Union[int, float]
+    pages: PageColumns
+    tempos: TempoColumns
+    events: EventColumns
+    notes: NoteColumns
+
+    @staticmethod
+    def from_chart(chart: Chart) -> 'ChartColumns':
+        return ChartColumns(chart.format_version, chart.time_base,
+                            chart.start_offset_time,
+                            PageColumns.from_chart(chart),
+                            TempoColumns.from_chart(chart),
+                            EventColumns.from_chart(chart),
+                            NoteColumns.from_chart(chart))
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'ChartColumns':
+        assert isinstance(obj, dict), "Object is not a dict."
+        pages = obj["page_list"]
+        tempos = obj["tempo_list"]
+        notes = obj["note_list"]
+        orders = obj["event_order_list"]
+
+        return ChartColumns(
+            obj["format_version"],
+            obj["time_base"],
+            obj["start_offset_time"],
+            PageColumns(_column(pages, "start_tick", np.int64),
+                        _column(pages, "end_tick", np.int64),
+                        _column(pages, "scan_line_direction", np.int8)),
+            TempoColumns(_column(tempos, "tick", np.int64),
+                         _column(tempos, "value", np.int64)),
+            EventColumns.from_orders(
+                _column(orders, "tick", np.int64),
+                [order["event_list"] for order in orders],
+                lambda evt: evt["type"],
+                lambda evt: EVENT_ARG_VALUE_INDEX[evt["args"]]),
+            NoteColumns(_column(notes, "page_index", np.int32),
+                        _column(notes, "type", np.int8),
+                        _column(notes, "id", np.int32),
+                        _column(notes, "tick", np.int64),
+                        _column(notes, "x", np.float64),
+                        _column(notes, "hold_tick", np.int64),
+                        _column(notes, "next_id", np.int32),
+                        np.array([isinstance(note["x"], int)
+                                  for note in notes], dtype=bool)),
+        )
+
+    def to_dict(self) -> dict:
+        result: dict = {}
+        result["format_version"] = self.format_version
+        result["time_base"] = self.time_base
+        result["start_offset_time"] = self.start_offset_time
+        result["page_list"] = [
+            {"start_tick": start, "end_tick": end, "scan_line_direction": direction}
+            for start, end, direction in zip(
+                self.pages.start_tick.tolist(), self.pages.end_tick.tolist(),
+                self.pages.scan_line_direction.tolist())
+        ]
+        result["tempo_list"] = [
+            {"tick": tick, "value": value}
+            for tick, value in zip(self.tempos.tick.tolist(),
+                                   self.tempos.value.tolist())
+        ]
+
+        event_orders = dict()
+        for tick, evt_type, evt_args, order in zip(
+                self.events.tick.tolist(), self.events.evt_type.tolist(),
+                self.events.evt_args.tolist(), self.events.order.tolist()):
+            event_orders.setdefault(order, {"tick": tick, "event_list": []})[
+                "event_list"].append(
+                    {"type": evt_type, "args": EVENT_ARG_VALUES[evt_args]})
+        result["event_order_list"] = list(event_orders.values())
+
+        notes = self.notes
+        xs = notes.x.tolist()
+        for idx in np.flatnonzero(notes.int_x & (notes.x == np.round(notes.x))):
+            xs[idx] = int(xs[idx])
+        result["note_list"] = [
+            {"page_index": page_index, "type": note_type, "id": note_id,
+             "tick": tick, "x": x, "hold_tick": hold_tick, "next_id": next_id}
+            for page_index, note_type, note_id, tick, x, hold_tick, next_id
+            in zip(notes.page_index.tolist(), notes.note_type.tolist(),
+                   notes.note_id.tolist(), notes.tick.tolist(),
+                   xs, notes.hold_tick.tolist(),
+                   notes.next_id.tolist())
+        ]
+        return result
+
+    def copy(self, **changes) -> 'ChartColumns':
+        return replace(self, **changes)
@@ -2,6 +2,7 @@ import os
 from dataclasses import InitVar, dataclass
 from typing import Any, List, Optional
 
+import bundle
 from chart.type_helper import (from_int, from_list, from_none, from_str,
                                from_union, to_class)
 
@@ -136,9 +137,9 @@ class LevelInfo:
     def are_paths_valid(self) -> bool:
         for item, path in self.paths.items():
             if item == "charts" or item == "overrides":
-                file_exists = all([os.path.exists(cpath) for cpath in path.values()])
+                file_exists = all([bundle.exists(cpath) for cpath in path.values()])
             else:
-                file_exists = os.path.exists(path)
+                file_exists = bundle.exists(path)
 
             if not file_exists:
                 return False
@@ -0,0 +1,2 @@
+from .catalog import Catalog, catalog_path
+from .corpus import Corpus, Level, is_chart_folder, is_level_folder
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import bundle
+from chart import LevelInfo
+
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+
+
+def _scan_files(folder: str) -> Dict[str, List[int]]:
+    files = dict()
+    for item in bundle.scandir(folder):
+        if item.is_file():
+            stat = item.stat()
+            files[item.name] = [stat.st_size, stat.st_mtime_ns]
+    return files
+
+
+def catalog_path(folder: str, catalog_dir: str) -> str:
+    """
+        Where the catalog of a charts folder is kept in catalog_dir, named
+        after the folder's absolute path so every folder gets its own.
+    """
+    folder = os.path.abspath(folder)
+    digest = hashlib.md5(folder.encode("utf8")).hexdigest()[:12]
+    return os.path.join(catalog_dir, f"{os.path.basename(folder)}-{digest}."
+                                     f"{CATALOG_NAME}")
+
+
+class Catalog:
+    """
+        Index of the level folders in a charts folder, saved as JSON at path
+        (catalog.json inside the folder by default, see catalog_path for
+        keeping it elsewhere). For every level it keeps the folder's mtime, the size and
+        mtime of its files, the level.json contents and whether every file
+        the level.json points to exists.
+
+        refresh lists the charts folder and every level folder once. Levels
+        whose folder mtime and file sizes and mtimes are all unchanged are
+        reused as they are; for the others, the level.json is only parsed
+        again if it changed. Files rewritten in place don't change their
+        folder's mtime, which is why the files are compared as well. Given
+        level IDs, only those folders are looked at.
+    """
+    def __init__(self, folder: str, path: Optional[str] = None):
+        self.folder = os.path.abspath(folder)
+        self.path = path or os.path.join(self.folder, CATALOG_NAME)
+        self.levels: Dict[str, dict] = dict()
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf8") as catalog_file:
+                    catalog = json.load(catalog_file)
+                if catalog.get("version") == CATALOG_VERSION:
+                    self.levels = catalog["levels"]
+            except ValueError:
+                self.levels = dict()
+
+    def refresh(self, level_ids: Optional[Iterable[str]] = None
+                ) -> Tuple[int, int]:
+        """
+            Updates the catalog from the folder, or only the entries of
+            level_ids if given. Returns how many folders were scanned again
+            and how many were reused.
+        """
+        if level_ids is None:
+            levels = dict()
+            folders = [(item.name, item.path, item.stat().st_mtime_ns)
+                       for item in bundle.scandir(self.folder)
+                       if item.is_dir()]
+        else:
+            levels = dict(self.levels)
+            folders = []
+            for level_id in level_ids:
+                levels.pop(level_id, None)
+                level_folder = os.path.join(self.folder, level_id)
+                if bundle.isdir(level_folder):
+                    folders.append((level_id, level_folder,
+                                    bundle.stat(level_folder).st_mtime_ns))
+
+        scanned = reused = 0
+        for level_id, level_folder, mtime_ns in folders:
+            files = _scan_files(level_folder)
+            entry = self.levels.get(level_id)
+            if entry is not None and entry["mtime_ns"] == mtime_ns and \
+                    entry["files"] == files:
+                reused += 1
+            else:
+                entry = self._scan_level(level_folder, mtime_ns, files, entry)
+                scanned += 1
+            levels[level_id] = entry
+
+        self.levels = levels
+        return scanned, reused
+
+    def _scan_level(self, level_folder: str, mtime_ns: int,
+                    files: Dict[str, List[int]],
+                    old_entry: Optional[dict]) -> dict:
+        entry = {"mtime_ns": mtime_ns, "files": files, "level": None,
+                 "valid": False}
+        if "level.json" not in files:
+            return entry
+
+        if old_entry is not None and old_entry["level"] is not None and \
+                old_entry["files"].get("level.json") == files["level.json"]:
+            entry["level"] = old_entry["level"]
+        else:
+            try:
+                with bundle.open_file(os.path.join(level_folder, "level.json"),
+                                      encoding="utf8") as level_json_file:
+                    entry["level"] = json.load(level_json_file)
+            except ValueError as err:
+                entry["error"] = f"level.json isn't valid JSON: {err}"
+                return entry
+
+        try:
+            level_info = LevelInfo.from_dict(entry["level"], self.folder)
+        except Exception as err:
+            entry["error"] = f"level.json is invalid: {err}"
+            return entry
+
+        entry["valid"] = self._paths_exist(level_folder, level_info, files)
+        if not entry["valid"]:
+            entry["error"] = "One of the paths in the level.json is invalid"
+        return entry
+
+    @staticmethod
+    def _paths_exist(level_folder: str, level_info: LevelInfo,
+                     files: Dict[str, List[int]]) -> bool:
+        paths = []
+        for item, path in level_info.paths.items():
+            if item == "charts" or item == "overrides":
+                paths.extend(path.values())
+            else:
+                paths.append(path)
+
+        for path in paths:
+            rel_path = os.path.relpath(path, level_folder)
+            # Files in subfolders weren't listed, so check those directly.
+            if rel_path not in files and not bundle.isfile(path):
+                return False
+        return True
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as catalog_file:
+            json.dump({"version": CATALOG_VERSION, "levels": self.levels},
+                      catalog_file)
+        os.replace(tmp_path, self.path)
+
+    def level_ids(self, valid_only: bool = False) -> List[str]:
+        return [level_id for level_id, entry in self.levels.items()
+                if "level.json" in entry["files"]
+                and (entry["valid"] or not valid_only)]
+
+    def is_valid(self, level_id: str) -> bool:
+        entry = self.levels.get(level_id)
+        return entry is not None and entry["valid"]
+
+    def level_info(self, level_id: str) -> LevelInfo:
+        return LevelInfo.from_dict(self.levels[level_id]["level"], self.folder)
+
+    def valid_level_info(self, level_id: str) -> LevelInfo:
+        """
+            The level's info, checked against the files seen by the last
+            refresh instead of statting them again.
+        """
+        entry = self.levels.get(level_id)
+        try:
+            if entry is None or "level.json" not in entry["files"]:
+                raise OSError(f"{level_id} has no level.json")
+            if not entry["valid"]:
+                raise OSError(entry["error"])
+            return self.level_info(level_id)
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {level_id}'s level.json"
+            ) from err
+
+    def files(self, level_id: str) -> Dict[str, List[int]]:
+        return self.levels[level_id]["files"]
@@ -0,0 +1,182 @@
+import json
+import os
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import bundle
+from analysis import DEFAULT_PEAK_WINDOWS, Analyzer
+from analysis.music import get_music_length
+from chart import Chart, ChartColumns, LevelInfo
+from chart.level_info import ChartInfo
+
+
+def is_level_folder(path: str) -> bool:
+    if not bundle.isdir(path):
+        return False
+
+    return any([f.name == "level.json" for f in bundle.scandir(path)])
+
+
+# The name the CLI has always used.
+is_chart_folder = is_level_folder
+
+
+class Level:
+    """
+        One level folder. Nothing is read when it's made: the level.json is
+        parsed the first time info is used, each difficulty's chart is parsed
+        the first time it's asked for, and stats are only computed once.
+        Difficulties default to the last (hardest) one, like analyze.
+    """
+    def __init__(self, folder: str, level_id: str,
+                 peak_windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS):
+        self.folder = folder
+        self.level_id = level_id
+        self.peak_windows = peak_windows
+        self._charts: Dict[str, Chart] = dict()
+        self._music_lengths: Dict[str, int] = dict()
+        self._analyzers: Dict[str, Analyzer] = dict()
+
+    def __repr__(self) -> str:
+        return f"Level({self.level_id!r})"
+
+    @cached_property
+    def info(self) -> LevelInfo:
+        level_json_path = os.path.join(self.folder, self.level_id, "level.json")
+        try:
+            with bundle.open_file(level_json_path,
+                                  encoding="utf8") as level_json_file:
+                return LevelInfo.from_dict(json.load(level_json_file),
+                                           self.folder)
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {self.level_id}'s level.json"
+            ) from err
+
+    @property
+    def difficulties(self) -> List[str]:
+        return [chart_info.name for chart_info in self.info.charts]
+
+    def chart_info(self, diff: Optional[str] = None) -> ChartInfo:
+        if diff is None:
+            return self.info.charts[-1]
+
+        for chart_info in self.info.charts:
+            if chart_info.name == diff:
+                return chart_info
+        raise KeyError(f"{self.level_id} has no {diff} chart.")
+
+    def chart(self, diff: Optional[str] = None) -> Chart:
+        diff = self.chart_info(diff).name
+        if diff not in self._charts:
+            try:
+                chart_path = self.info.paths["charts"][diff]
+                with bundle.open_file(chart_path,
+                                      encoding="utf8") as chart_file:
+                    self._charts[diff] = Chart.from_dict(json.load(chart_file))
+            except Exception as err:
+                raise Exception(
+                    f"There's something wrong with {self.level_id}'s "
+                    f"{diff} chart."
+                ) from err
+
+        return self._charts[diff]
+
+    def columns(self, diff: Optional[str] = None) -> ChartColumns:
+        return ChartColumns.from_chart(self.chart(diff))
+
+    def music_path(self, diff: Optional[str] = None) -> str:
+        diff = self.chart_info(diff).name
+        level_paths = self.info.paths
+        if diff in level_paths.get("overrides", {}):
+            return level_paths["overrides"][diff]
+        return level_paths["music"]
+
+    def music_length(self, diff: Optional[str] = None) -> int:
+        music_path = self.music_path(diff)
+        if music_path not in self._music_lengths:
+            self._music_lengths[music_path] = get_music_length(music_path)
+        return self._music_lengths[music_path]
+
+    def analyzer(self, diff: Optional[str] = None) -> Analyzer:
+        """
+            Returns the started analyzer of a difficulty, made from the
+            already parsed level and chart.
+        """
+        chart_info = self.chart_info(diff)
+        diff = chart_info.name
+        if diff not in self._analyzers:
+            analyzer = Analyzer.from_level(self.info, chart_info,
+                                           self.chart(diff),
+                                           self.music_path(diff),
+                                           self.music_length(diff),
+                                           self.peak_windows)
+            analyzer.start()
+            self._analyzers[diff] = analyzer
+
+        return self._analyzers[diff]
+
+    def stats(self, diff: Optional[str] = None) -> dict:
+        return self.analyzer(diff).get_stats_as_json()
+
+    def unload(self):
+        """
+            Drops everything that was loaded, so the level can be read again
+            from scratch without keeping its charts in memory.
+        """
+        self.__dict__.pop("info", None)
+        self._charts.clear()
+        self._music_lengths.clear()
+        self._analyzers.clear()
+
+
+class Corpus:
+    """
+        A folder of levels. The folder is only listed when the level IDs are
+        first needed, and each Level is made once and kept, so whatever it has
+        loaded is reused. Call unload on levels (or on the corpus) to free
+        them when going through a large folder.
+    """
+    def __init__(self, folder: str,
+                 peak_windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS):
+        self.folder = os.path.abspath(folder)
+        self.peak_windows = peak_windows
+        self._levels: Dict[str, Level] = dict()
+
+    def __repr__(self) -> str:
+        return f"Corpus({self.folder!r})"
+
+    @cached_property
+    def level_ids(self) -> List[str]:
+        return [item.name for item in bundle.scandir(self.folder)
+                if is_level_folder(item.path)]
+
+    def __len__(self) -> int:
+        return len(self.level_ids)
+
+    def __iter__(self) -> Iterator[Level]:
+        for level_id in self.level_ids:
+            yield self[level_id]
+
+    def __contains__(self, level_id: str) -> bool:
+        return (level_id in self._levels
+                or is_level_folder(os.path.join(self.folder, level_id)))
+
+    def __getitem__(self, level_id: str) -> Level:
+        if level_id not in self._levels:
+            if not is_level_folder(os.path.join(self.folder, level_id)):
+                raise KeyError(f"{level_id} is not a level in {self.folder}.")
+            self._levels[level_id] = Level(self.folder, level_id,
+                                           self.peak_windows)
+
+        return self._levels[level_id]
+
+    def refresh(self):
+        """
+            Lists the folder again the next time the level IDs are needed.
+        """
+        self.__dict__.pop("level_ids", None)
+
+    def unload(self):
+        for level in self._levels.values():
+            level.unload()
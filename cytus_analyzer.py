@@ -3,18 +3,43 @@ import json
 import os
 import sys
 import pandas as pd
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from analysis import Analyzer, NoteDistPlotter
-from excel import ExcelWriter
+from analysis import (ACCURACY_MODELS, DEFAULT_PEAK_WINDOWS, STAT_GROUPS,
+                      AccuracyModel, Analyzer, ChartDiff, get_stat_columns)
+from analysis.note_dist import (BIN_AGGS, DEFAULT_BIN_WIDTH, BinWidth,
+                                format_bin_width, get_render_settings)
+from analysis.score import DEFAULT_RUNS
+from batch import (BinWidthType, Journal, MemoryBudget, MemoryTracker,
+                   MemoryType, Pipeline, ShardType, SourceType, select_shard,
+                   shard_suffix)
+from batch.memory import (estimate_cost, estimate_costs, largest_first,
+                          report_memory)
+from batch.render_cache import RenderCache, fingerprint, settings_hash
+from batch.tasks import (count_dist, get_input_paths, load_analyzer,
+                         load_dist_plotter, load_note_types, render_dist,
+                         run_analyzer, simulate_chart, write_bin_table,
+                         write_file, write_timelines)
+from bundle import isdir, isfile, open_file, scandir
+from chart import Chart
+from corpus import Catalog, catalog_path, is_chart_folder
+from excel import ExcelWriter, StreamingExcelWriter
 from file_org import Organizer
+from note_index import build_index as build_note_index
 from paths import CHART_PATH, MAIN_FILE_PATH, OUT_PATH
+from transform import (change_rate, mirror, shift_offset, thin,
+                       transform_level)
 
-path_type = click.Path(exists=True, file_okay=False, dir_okay=True)
+# Sources can be folders, zip/tar archives or folders inside those.
+src_path_type = SourceType()
 opt_path_type = click.Path(exists=False, file_okay=False, dir_okay=True)
 file_type = click.Path(file_okay=True, dir_okay=False)
 default_excel_path = os.path.join(OUT_PATH, "stats.xlsx")
 default_dist_path = os.path.join(OUT_PATH, "note_dists")
+default_index_path = os.path.join(OUT_PATH, "note_index")
+default_transform_path = os.path.join(OUT_PATH, "transformed")
+default_sim_path = os.path.join(OUT_PATH, "score_sim.xlsx")
+default_catalog_dir = os.path.join(OUT_PATH, "catalogs")
 
 
 @click.group("cytus_analyzer")
@@ -22,17 +47,87 @@ def cli():
     pass
 
 
-def is_chart_folder(path: str):
-    if not os.path.isdir(path):
-        return False
+def report_failures(journal: Journal):
+    if not journal.failed:
+        return
 
-    return any([f.name == "level.json" for f in os.scandir(path)])
+    click.echo(f"{len(journal.failed)} charts failed (see {journal.path}):")
+    for chart_id, error in journal.failed.items():
+        click.echo(f"  {chart_id}: {error}")
+
+
+def refresh_catalog(folder: str,
+                    level_ids: Optional[Iterable[str]] = None) -> Catalog:
+    """
+        Refreshes the catalog of folder, kept under OUT_PATH so source
+        folders are only ever read. Given level IDs, only those are looked
+        at.
+    """
+    catalog = Catalog(folder, catalog_path(folder, default_catalog_dir))
+    catalog.refresh(level_ids or None)
+    try:
+        os.makedirs(default_catalog_dir, exist_ok=True)
+        catalog.save()
+    except OSError as err:
+        click.echo(f"Couldn't save the catalog of {folder}: {err}", err=True)
+    return catalog
+
+
+def open_journal(path: str, resume: bool, options: dict,
+                 keep_results: bool = True) -> Journal:
+    try:
+        return Journal(path, resume, keep_results, options)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--resume")
+
+
+def schedule_by_memory(chart_ids: List[str], src: str, with_figure: bool = False,
+                       max_width: Optional[int] = None) -> Tuple[List[str], Dict[str, int]]:
+    click.echo(f"Estimating the memory use of {len(chart_ids)} charts...")
+    costs = estimate_costs(chart_ids,
+                           lambda cid: estimate_cost(src, cid, with_figure,
+                                                     max_width))
+    return largest_first(chart_ids, costs), costs
+
+
+def select_stats(stat_groups: Tuple[str, ...], columns: Optional[str],
+                 windows: Tuple[float, ...], with_timelines: bool
+                 ) -> Tuple[Optional[List[str]], Optional[Set[str]]]:
+    """
+        Works out which stat groups to compute and which columns to keep
+        from --stats and --columns. Returns (None, None) to compute and keep
+        everything.
+    """
+    if not stat_groups and columns is None:
+        return None, None
+
+    group_columns = get_stat_columns(windows)
+    column_groups = {col: group for group, cols in group_columns.items()
+                     for col in cols}
+
+    groups = list(stat_groups)
+    keep = {col for group in stat_groups for col in group_columns[group]}
+    if columns is not None:
+        column_list = [col.strip() for col in columns.split(",") if col.strip()]
+        unknown = [col for col in column_list if col not in column_groups]
+        if unknown:
+            raise click.BadParameter(
+                f"unknown column(s) {', '.join(unknown)}",
+                param_hint="--columns")
+        groups.extend(column_groups[col] for col in column_list)
+        keep.update(column_list)
+
+    if with_timelines:
+        groups.extend(["scan_line", "events", "page_stats"])
+
+    return groups, keep
 
 
 @click.command("org_files")
 @click.option("--src", "--in", "-s", "-i",
-              type=path_type, default=MAIN_FILE_PATH,
-              help="Folder containing all songs, charts, meta, etc.")
+              type=src_path_type, default=MAIN_FILE_PATH,
+              help="Folder or zip/tar archive containing all songs, charts, "
+                   "meta, etc.")
 @click.option("--dest", "--out", "-d", "-o",
               type=opt_path_type, default=CHART_PATH,
               help="Folder where all files are grouped")
@@ -43,25 +138,39 @@ def org_files(src: str = MAIN_FILE_PATH, dest: str = CHART_PATH, force: bool = F
     """
         Groups all files into folders based on the song.
     """
-    def get_name(song: dict) -> str:
-        return "" if song is None else song["song_name"]
+    def get_name(item: Tuple[Tuple[dict, bool], Any]) -> str:
+        return "" if item is None else item[0][0]["song_name"]
 
     click.echo("Loading song metadata...")
     src = os.path.abspath(src)
     dest = os.path.abspath(dest)
     os.makedirs(dest, exist_ok=True)
 
-    organizer = Organizer(src, dest, force)
-    label = f"Organizing {len(organizer.song_infos)} songs..."
-    with click.progressbar(organizer.song_infos,
-                           label=label,
-                           item_show_func=get_name) as prog_bar:
-        for song_info in prog_bar:
-            organizer.organize(song_info)
+    catalog = refresh_catalog(dest)
+    journal = Journal(os.path.join(dest, "org_files.journal"),
+                      resume=not force)
+    organizer = Organizer(src, dest, force, catalog, journal)
+    levels = [(song_info, is_glitch) for song_info in organizer.song_infos
+              for is_glitch in (False, True)
+              if not is_glitch or "glitch" in song_info["charts"]]
+
+    def write_level(level: Tuple[dict, bool], level_json: Optional[dict]):
+        if level_json is not None:
+            organizer.write_level(level[0], level_json, level[1])
 
-            if "glitch" in song_info["charts"]:
-                organizer.organize(song_info, True)
+    pipeline = Pipeline(lambda level: organizer.prepare(*level),
+                        write=write_level)
+    # Counts Chaos and Glitch charts separately, like the progress bar.
+    label = f"Organizing {len(levels)} charts..."
+    with journal, click.progressbar(pipeline.run(levels),
+                                    length=len(levels),
+                                    label=label,
+                                    item_show_func=get_name) as prog_bar:
+        for _, level_json in prog_bar:
+            if level_json is None:
+                organizer.num_of_charts["exist"] += 1
 
+    refresh_catalog(dest)
     click.echo(
         f"{organizer.num_of_charts['success']:03} Chaos Charts organized\n"
         f"{organizer.num_of_charts['success_glitch']:03} Glitch Charts organized\n"
@@ -72,39 +181,174 @@ def org_files(src: str = MAIN_FILE_PATH, dest: str = CHART_PATH, force: bool = F
 @click.command("analyze")
 @click.argument("chart_ids", type=click.STRING, nargs=-1)
 @click.option("--src", "--in", "-s", "-i",
-              type=path_type, default=CHART_PATH,
-              help="Folder all levels & charts")
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
 @click.option("--dest", "--out", "-d", "-o",
               type=file_type, default=default_excel_path,
               help="Folder where all statistics are written")
-def analyze(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = default_excel_path):
+@click.option("--window", "-w", "windows",
+              type=click.FLOAT, multiple=True, default=DEFAULT_PEAK_WINDOWS,
+              help="Window length in seconds used for peak note rates "
+                   "(can be given multiple times)")
+@click.option("--timeline-dir", "-t",
+              type=opt_path_type, default=None,
+              help="Folder where per-chart scan line and speed event "
+                   "timelines and page tables are written")
+@click.option("--resume",
+              is_flag=True,
+              help="Skip charts finished by the last run")
+@click.option("--keep-going", "-k",
+              is_flag=True,
+              help="Record failed charts and continue with the rest")
+@click.option("--shard",
+              type=ShardType(), default=None,
+              help="Only analyze shard i of N (e.g. 1/4) and write its stats "
+                   "as JSON for the merge command")
+@click.option("--stream",
+              is_flag=True,
+              help="Write each chart's row as soon as it's analyzed instead "
+                   "of keeping every chart's stats in memory (rows are in "
+                   "the order charts are analyzed in, after the rows of a "
+                   "resumed run)")
+@click.option("--max-memory",
+              type=MemoryType(), default=None,
+              help="Memory budget (e.g. 2G) for the charts in flight; the "
+                   "largest charts go first and fewer run at once when they "
+                   "are big")
+@click.option("--measure-memory",
+              is_flag=True,
+              help="Measure the peak memory of every chart and report the "
+                   "largest at the end. Reading and writing pause while a "
+                   "chart is measured, so this is slower")
+@click.option("--stats", "-S", "stat_groups",
+              type=click.Choice(STAT_GROUPS), multiple=True,
+              help="Only compute this group of stats (can be given multiple "
+                   "times)")
+@click.option("--columns", "-c",
+              type=click.STRING, default=None,
+              help="Comma-separated list of the columns to write; only the "
+                   "stats they need are computed")
+def analyze(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = default_excel_path,
+            windows: Tuple[float, ...] = DEFAULT_PEAK_WINDOWS,
+            timeline_dir: Optional[str] = None, resume: bool = False,
+            keep_going: bool = False, shard: Optional[Tuple[int, int]] = None,
+            stream: bool = False, max_memory: Optional[int] = None,
+            measure_memory: bool = False,
+            stat_groups: Tuple[str, ...] = (), columns: Optional[str] = None):
     """
         Analyzes charts given a list of IDs. If you want to analyze all levels
         in src, don't input any IDs.
     """
+    catalog = refresh_catalog(src, chart_ids)
     if len(chart_ids) == 0:
-        with os.scandir(src) as dir_items:
-            chart_ids = [cid.name for cid in dir_items
-                         if is_chart_folder(cid.path)]
+        chart_ids = catalog.level_ids()
+    chart_ids = select_shard(chart_ids, shard)
+    stat_groups, keep_columns = select_stats(stat_groups, columns, windows,
+                                             timeline_dir is not None)
 
     if len(chart_ids) == 0:
         click.echo("No charts in the folder!")
 
-    stat_list = dict()
     src = os.path.abspath(src)
     dest = os.path.abspath(dest)
+    if shard is not None:
+        dest = f"{os.path.splitext(dest)[0]}.{shard_suffix(shard)}.json"
     os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if timeline_dir is not None:
+        timeline_dir = os.path.abspath(timeline_dir)
+        os.makedirs(timeline_dir, exist_ok=True)
 
-    with click.progressbar(chart_ids,
-                           label=f"Analyzing {len(chart_ids)} charts...",
-                           item_show_func=lambda x: x) as prog_bar:
-        for chart_id in prog_bar:
-            analyzer = Analyzer(src, chart_id)
-            analyzer.start()
-            stats = analyzer.get_stats_as_json()
-            stat_list[chart_id] = stats
+    # Rows from other windows or stats would have other columns.
+    options = {"windows": windows, "stats": stat_groups,
+               "columns": None if keep_columns is None else sorted(keep_columns)}
+    journal = open_journal(f"{dest}.journal", resume, options,
+                           keep_results=not stream)
+    todo_ids = [cid for cid in chart_ids if not journal.is_done(cid)]
+    if len(todo_ids) < len(chart_ids):
+        click.echo(f"Resuming, {len(chart_ids) - len(todo_ids)} charts "
+                   f"already analyzed.")
+
+    excel_writer = None
+    if stream and shard is None:
+        excel_writer = StreamingExcelWriter(dest)
+        chart_id_set = set(chart_ids)
+        for chart_id, stats in journal.iter_done():
+            if chart_id in chart_id_set:
+                excel_writer.write_row(chart_id, stats)
+
+    def write_analyzer(chart_id: str, result: Tuple[Analyzer, dict]):
+        if timeline_dir is not None:
+            write_timelines(timeline_dir, chart_id, result[0])
+        if excel_writer is not None:
+            excel_writer.write_row(chart_id, result[1])
+        journal.record_done(chart_id, result[1])
+
+    costs: Dict[str, int] = dict()
+    budget = tracker = None
+    if max_memory is not None or measure_memory:
+        todo_ids, costs = schedule_by_memory(todo_ids, src)
+    if max_memory is not None:
+        budget = MemoryBudget(max_memory)
+    if measure_memory:
+        tracker = MemoryTracker()
+
+    pipeline = Pipeline(lambda chart_id: load_analyzer(src, chart_id, windows,
+                                                       stat_groups, catalog),
+                        lambda analyzer: run_analyzer(analyzer, keep_columns),
+                        write_analyzer,
+                        on_error=journal.record_failure if keep_going else None,
+                        cost=costs.get, budget=budget, tracker=tracker)
+    with journal, click.progressbar(pipeline.run(todo_ids),
+                                    length=len(todo_ids),
+                                    label=f"Analyzing {len(todo_ids)} charts...",
+                                    item_show_func=lambda x: x and x[0]) as prog_bar:
+        for _ in prog_bar:
+            pass
+
+    report_failures(journal)
+    if tracker is not None:
+        report_memory(tracker, costs, max_memory)
+
+    if excel_writer is not None:
+        click.echo(f"Done analyzing, now closing {dest}...")
+        excel_writer.close()
+        click.echo("Stats successfully saved.")
+        return
 
     click.echo(f"Done analyzing, now saving to {dest}...")
+    if shard is not None:
+        if stream:
+            chart_id_set = set(chart_ids)
+            stat_items = ((cid, stats) for cid, stats in journal.iter_done()
+                          if cid in chart_id_set)
+        else:
+            stat_items = ((cid, journal.done[cid]) for cid in chart_ids
+                          if journal.is_done(cid))
+        save_shard_stats(stat_items, shard, dest)
+    else:
+        stat_list = {cid: journal.done[cid] for cid in chart_ids
+                     if journal.is_done(cid)}
+        save_stats(stat_list, dest)
+
+    click.echo("Stats successfully saved.")
+
+
+def save_shard_stats(stat_items: Iterable[Tuple[str, dict]],
+                     shard: Tuple[int, int], dest: str):
+    """
+        Writes the shard file one chart at a time, so the stats don't have to
+        be collected into a single dict first.
+    """
+    with open(dest, "w", encoding="utf8") as shard_file:
+        shard_file.write(f'{{"shard": {json.dumps(shard)}, "stats": {{')
+        for idx, (chart_id, stats) in enumerate(stat_items):
+            if idx > 0:
+                shard_file.write(", ")
+            shard_file.write(f"{json.dumps(chart_id)}: {json.dumps(stats)}")
+        shard_file.write("}}")
+
+
+def save_stats(stat_list: Dict[str, dict], dest: str):
     dest_folder = os.path.dirname(dest)
     os.makedirs(dest_folder, exist_ok=True)
 
@@ -115,47 +359,492 @@ def analyze(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = defaul
     excel_writer.format_table()
     excel_writer.close()
 
+
+@click.command("merge")
+@click.argument("shard_paths", type=click.Path(exists=True, dir_okay=False),
+                nargs=-1, required=True)
+@click.option("--dest", "--out", "-d", "-o",
+              type=file_type, default=default_excel_path,
+              help="Folder where all statistics are written")
+def merge(shard_paths: List[str], dest: str = default_excel_path):
+    """
+        Combines the stats written by analyze --shard into one workbook.
+    """
+    stat_list = dict()
+    shard_count = None
+    found_shards = set()
+    for shard_path in shard_paths:
+        with open(shard_path, encoding="utf8") as shard_file:
+            shard_stats = json.load(shard_file)
+
+        index, count = shard_stats["shard"]
+        if shard_count is not None and count != shard_count:
+            raise click.BadParameter(
+                f"{shard_path} is shard {index}/{count}, but the other files "
+                f"are out of {shard_count}.")
+        shard_count = count
+        found_shards.add(index)
+        stat_list.update(shard_stats["stats"])
+
+    missing = sorted(set(range(1, shard_count + 1)) - found_shards)
+    if missing:
+        click.echo("Warning: missing shard(s) "
+                   + ", ".join(f"{idx}/{shard_count}" for idx in missing))
+
+    dest = os.path.abspath(dest)
+    click.echo(f"Merging {len(stat_list)} charts from {len(shard_paths)} "
+               f"shards, now saving to {dest}...")
+    save_stats({cid: stat_list[cid] for cid in sorted(stat_list)}, dest)
     click.echo("Stats successfully saved.")
 
 
 @click.command("plot_dist")
 @click.argument("chart_ids", type=click.STRING, nargs=-1)
 @click.option("--src", "--in", "-s", "-i",
-              type=path_type, default=CHART_PATH,
-              help="Folder all levels & charts")
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
 @click.option("--dest", "--out", "-d", "-o",
               type=opt_path_type, default=default_dist_path,
               help="Folder where all note distributions are written")
-def plot_dist(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = default_dist_path):
+@click.option("--peak-window", "-w",
+              type=click.FLOAT, default=None,
+              help="Highlight the densest section of this many seconds")
+@click.option("--resume",
+              is_flag=True,
+              help="Skip charts finished by the last run")
+@click.option("--keep-going", "-k",
+              is_flag=True,
+              help="Record failed charts and continue with the rest")
+@click.option("--shard",
+              type=ShardType(), default=None,
+              help="Only plot shard i of N (e.g. 1/4)")
+@click.option("--force", "-f",
+              is_flag=True,
+              help="Redraw note dists even if their chart, song and the "
+                   "plot settings haven't changed")
+@click.option("--max-width",
+              type=click.IntRange(min=600), default=None,
+              help="Maximum image width in pixels; longer songs are drawn "
+                   "with several bins per bar")
+@click.option("--agg",
+              type=click.Choice(BIN_AGGS), default="max",
+              help="What a bar of several bins shows: the busiest bin "
+                   "or the average")
+@click.option("--tiles",
+              is_flag=True,
+              help="With --max-width, also draw the song at full detail "
+                   "split into images of that width")
+@click.option("--heatmap",
+              is_flag=True,
+              help="Also draw a heatmap of where the notes are across the "
+                   "screen over time")
+@click.option("--bin", "-b", "bin_width",
+              type=BinWidthType(), default=DEFAULT_BIN_WIDTH,
+              help="Width of each bar: seconds (0.5s), milliseconds (250ms), "
+                   "beat or page")
+@click.option("--max-memory",
+              type=MemoryType(), default=None,
+              help="Memory budget (e.g. 2G) for the charts in flight; the "
+                   "largest charts go first and fewer run at once when they "
+                   "are big")
+@click.option("--measure-memory",
+              is_flag=True,
+              help="Measure the peak memory of every chart and report the "
+                   "largest at the end. Reading and writing pause while a "
+                   "chart is measured, so this is slower")
+def plot_dist(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = default_dist_path,
+              peak_window: Optional[float] = None, resume: bool = False,
+              keep_going: bool = False, shard: Optional[Tuple[int, int]] = None,
+              max_memory: Optional[int] = None, measure_memory: bool = False,
+              force: bool = False,
+              max_width: Optional[int] = None, agg: str = "max",
+              tiles: bool = False, heatmap: bool = False,
+              bin_width: BinWidth = DEFAULT_BIN_WIDTH):
     """
         Plots the note distribution of charts given a list of IDs.
         If you want to analyze all levels in src, don't input any IDs.
     """
+    catalog = refresh_catalog(src, chart_ids)
     if len(chart_ids) == 0:
-        with os.scandir(src) as dir_items:
-            chart_ids = [cid.name for cid in dir_items
-                         if is_chart_folder(cid.path)]
+        chart_ids = catalog.level_ids()
+    chart_ids = select_shard(chart_ids, shard)
+
+    if len(chart_ids) == 0:
+        click.echo("No charts in the folder!")
+
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+    os.makedirs(dest, exist_ok=True)
+
+    if tiles and max_width is None:
+        raise click.BadParameter("needs --max-width", param_hint="--tiles")
+
+    journal_name = ("plot_dist.journal" if shard is None
+                    else f"plot_dist.{shard_suffix(shard)}.journal")
+    settings = get_render_settings(peak_window, max_width, agg, tiles, heatmap,
+                                   bin_width)
+    journal = open_journal(os.path.join(dest, journal_name), resume,
+                           {"settings": settings_hash(settings)})
+    todo_ids = [cid for cid in chart_ids if not journal.is_done(cid)]
+    if len(todo_ids) < len(chart_ids):
+        click.echo(f"Resuming, {len(chart_ids) - len(todo_ids)} charts "
+                   f"already plotted.")
+
+    cache = RenderCache(os.path.join(dest, "render_cache.json"), settings)
+    inputs = {cid: fingerprint(get_input_paths(src, cid)) for cid in todo_ids}
+    if not force:
+        fresh_ids = {cid for cid in todo_ids
+                     if cache.is_fresh(cid, inputs[cid])}
+        if fresh_ids:
+            click.echo(f"{len(fresh_ids)} note dists are up to date, "
+                       f"skipping them (use --force to redraw).")
+            todo_ids = [cid for cid in todo_ids if cid not in fresh_ids]
+
+    def write_image(chart_id: str, images: Dict[str, bytes]):
+        paths = [os.path.join(dest, f"{chart_id}{suffix}.png")
+                 for suffix in images]
+        for path, image in zip(paths, images.values()):
+            write_file(path, image)
+        cache.record(chart_id, inputs[chart_id], paths)
+        journal.record_done(chart_id)
+
+    costs: Dict[str, int] = dict()
+    budget = tracker = None
+    if max_memory is not None or measure_memory:
+        todo_ids, costs = schedule_by_memory(todo_ids, src, with_figure=True,
+                                             max_width=max_width)
+    if max_memory is not None:
+        budget = MemoryBudget(max_memory)
+    if measure_memory:
+        tracker = MemoryTracker()
+
+    pipeline = Pipeline(lambda chart_id: load_dist_plotter(src, chart_id,
+                                                           catalog),
+                        lambda dist_plotter: render_dist(dist_plotter, peak_window,
+                                                         max_width, agg, tiles,
+                                                         heatmap, bin_width),
+                        write_image,
+                        on_error=journal.record_failure if keep_going else None,
+                        cost=costs.get, budget=budget, tracker=tracker)
+    try:
+        with journal, click.progressbar(pipeline.run(todo_ids),
+                                        length=len(todo_ids),
+                                        label=f"Plotting {len(todo_ids)} note dists...",
+                                        item_show_func=lambda x: x and x[0]) as prog_bar:
+            for _ in prog_bar:
+                pass
+    finally:
+        cache.save()
+
+    report_failures(journal)
+    if tracker is not None:
+        report_memory(tracker, costs, max_memory)
+
+
+@click.command("export_dist")
+@click.argument("chart_ids", type=click.STRING, nargs=-1)
+@click.option("--src", "--in", "-s", "-i",
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
+@click.option("--dest", "--out", "-d", "-o",
+              type=opt_path_type, default=default_dist_path,
+              help="Folder where the binned note counts are saved")
+@click.option("--bin", "-b", "bin_width",
+              type=BinWidthType(), default=DEFAULT_BIN_WIDTH,
+              help="Width of each bin: seconds (0.5s), milliseconds (250ms), "
+                   "beat or page")
+@click.option("--format", "-F", "file_format",
+              type=click.Choice(["npy", "csv"]), default="npy",
+              help="File format of the binned note counts")
+def export_dist(chart_ids: List[str] = [], src: str = CHART_PATH,
+                dest: str = default_dist_path,
+                bin_width: BinWidth = DEFAULT_BIN_WIDTH,
+                file_format: str = "npy"):
+    """
+        Saves the binned note counts behind the note distributions, without
+        drawing them. If you want to export all levels in src, don't input
+        any IDs.
+    """
+    catalog = refresh_catalog(src, chart_ids)
+    if len(chart_ids) == 0:
+        chart_ids = catalog.level_ids()
+
+    if len(chart_ids) == 0:
+        click.echo("No charts in the folder!")
+
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+    os.makedirs(dest, exist_ok=True)
+    suffix = f"{format_bin_width(bin_width)}.{file_format}"
+
+    def write_table(chart_id: str, table: Dict[str, Any]):
+        write_bin_table(os.path.join(dest, f"{chart_id}.{suffix}"), table)
+
+    pipeline = Pipeline(lambda chart_id: load_dist_plotter(src, chart_id,
+                                                           catalog),
+                        lambda dist_plotter: count_dist(dist_plotter, bin_width),
+                        write_table)
+    with click.progressbar(pipeline.run(chart_ids),
+                           length=len(chart_ids),
+                           label=f"Exporting {len(chart_ids)} note dists...",
+                           item_show_func=lambda x: x and x[0]) as prog_bar:
+        for _ in prog_bar:
+            pass
+
+    click.echo(f"Binned note counts saved to {dest}.")
+
+
+@click.command("build_index")
+@click.argument("chart_ids", type=click.STRING, nargs=-1)
+@click.option("--src", "--in", "-s", "-i",
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
+@click.option("--dest", "--out", "-d", "-o",
+              type=opt_path_type, default=default_index_path,
+              help="Folder where the note index is written")
+def build_index(chart_ids: List[str] = [], src: str = CHART_PATH, dest: str = default_index_path):
+    """
+        Packs the notes, pages and tempos of charts into one memory-mapped
+        note index that can be queried with note_index.NoteIndex. If you want
+        to index all levels in src, don't input any IDs.
+    """
+    if len(chart_ids) == 0:
+        chart_ids = refresh_catalog(src).level_ids()
+
+    if len(chart_ids) == 0:
+        click.echo("No charts in the folder!")
+
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+
+    click.echo(f"Indexing {len(chart_ids)} charts...")
+    note_count = build_note_index(src, chart_ids, dest)
+    click.echo(f"{note_count} notes indexed to {dest}.")
+
+
+def diff_levels(old_src: str, old_id: str, new_src: str, new_id: str) -> ChartDiff:
+    old_analyzer = Analyzer(old_src, old_id)
+    new_analyzer = Analyzer(new_src, new_id)
+    chart_diff = ChartDiff.from_charts(old_analyzer.chart, new_analyzer.chart)
+
+    old_analyzer.start()
+    new_analyzer.start()
+    chart_diff.add_stat_deltas(old_analyzer.get_stats_as_json(),
+                               new_analyzer.get_stats_as_json())
+    return chart_diff
+
+
+@click.command("diff")
+@click.argument("old", type=SourceType(files=True))
+@click.argument("new", type=SourceType(files=True))
+@click.option("--dest", "--out", "-d", "-o",
+              type=file_type, default=None,
+              help="JSON file where the full diff report is written")
+def diff(old: str, new: str, dest: Optional[str] = None):
+    """
+        Compares two versions of a chart. OLD and NEW can be two chart files,
+        two level folders or two folders of levels, in which case every level
+        in NEW is compared to the level with the same ID in OLD.
+    """
+    old = os.path.abspath(old)
+    new = os.path.abspath(new)
+    report = dict()
+
+    if isfile(old) and isfile(new):
+        with open_file(old, encoding="utf8") as old_file, \
+                open_file(new, encoding="utf8") as new_file:
+            chart_diff = ChartDiff.from_charts(
+                Chart.from_dict(json.load(old_file)),
+                Chart.from_dict(json.load(new_file)))
+        report[os.path.basename(new)] = chart_diff
+    elif is_chart_folder(old) and is_chart_folder(new):
+        report[os.path.basename(new)] = diff_levels(
+            os.path.dirname(old), os.path.basename(old),
+            os.path.dirname(new), os.path.basename(new))
+    elif isdir(old) and isdir(new):
+        old_ids = {cid.name for cid in scandir(old)
+                   if is_chart_folder(cid.path)}
+        new_ids = {cid.name for cid in scandir(new)
+                   if is_chart_folder(cid.path)}
+
+        for chart_id in sorted(new_ids - old_ids):
+            click.echo(f"{chart_id}: new level")
+        for chart_id in sorted(old_ids - new_ids):
+            click.echo(f"{chart_id}: removed level")
+
+        common_ids = sorted(old_ids & new_ids)
+        with click.progressbar(common_ids,
+                               label=f"Comparing {len(common_ids)} charts...",
+                               item_show_func=lambda x: x) as prog_bar:
+            for chart_id in prog_bar:
+                report[chart_id] = diff_levels(old, chart_id, new, chart_id)
+    else:
+        raise click.BadParameter("OLD and NEW must both be chart files or "
+                                 "both be folders.")
+
+    for chart_id, chart_diff in report.items():
+        if chart_diff.is_empty():
+            continue
+
+        changes = ", ".join(f"{count} {key.replace('_', ' ')}"
+                            for key, count in chart_diff.summary().items()
+                            if count)
+        click.echo(f"{chart_id}: {changes}")
+
+    changed = sum(not chart_diff.is_empty() for chart_diff in report.values())
+    click.echo(f"{changed} of {len(report)} charts changed.")
+
+    if dest is not None:
+        dest = os.path.abspath(dest)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "w", encoding="utf8") as report_file:
+            json.dump({chart_id: chart_diff.to_dict()
+                       for chart_id, chart_diff in report.items()},
+                      report_file, indent=4, default=str)
+        click.echo(f"Diff report saved to {dest}.")
+
+
+@click.command("transform")
+@click.argument("chart_ids", type=click.STRING, nargs=-1)
+@click.option("--src", "--in", "-s", "-i",
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
+@click.option("--dest", "--out", "-d", "-o",
+              type=opt_path_type, default=default_transform_path,
+              help="Folder where the transformed levels are written")
+@click.option("--mirror", "-m", "mirror_x",
+              is_flag=True,
+              help="Flip every note horizontally")
+@click.option("--rate", "-r",
+              type=click.FLOAT, default=None,
+              help="Scale every tempo by this rate (the audio is not changed)")
+@click.option("--thin", "-t", "thin_ratio",
+              type=click.FloatRange(0, 1), default=None,
+              help="Keep only this fraction of taps, holds and flicks")
+@click.option("--offset",
+              type=click.FLOAT, default=None,
+              help="Shift the chart by this many seconds")
+def transform(chart_ids: List[str] = [], src: str = CHART_PATH,
+              dest: str = default_transform_path, mirror_x: bool = False,
+              rate: Optional[float] = None, thin_ratio: Optional[float] = None,
+              offset: Optional[float] = None):
+    """
+        Writes transformed copies of levels (e.g. for practice charts) given
+        a list of IDs. If you want to transform all levels in src, don't input
+        any IDs.
+    """
+    transforms = []
+    if mirror_x:
+        transforms.append(mirror)
+    if rate is not None:
+        transforms.append(change_rate(rate))
+    if thin_ratio is not None:
+        transforms.append(thin(thin_ratio))
+    if offset is not None:
+        transforms.append(shift_offset(offset))
+
+    if len(chart_ids) == 0:
+        chart_ids = refresh_catalog(src).level_ids()
 
     if len(chart_ids) == 0:
         click.echo("No charts in the folder!")
 
-    stat_list = dict()
     src = os.path.abspath(src)
     dest = os.path.abspath(dest)
     os.makedirs(dest, exist_ok=True)
 
+    chart_count = 0
     with click.progressbar(chart_ids,
-                           label=f"Plotting {len(chart_ids)} note dists...",
+                           label=f"Transforming {len(chart_ids)} levels...",
                            item_show_func=lambda x: x) as prog_bar:
         for chart_id in prog_bar:
-            dist_plotter = NoteDistPlotter(src, chart_id)
-            dist_plotter.count_notes()
-            dist_plotter.plot_counts(os.path.join(dest, f"{chart_id}.png"))
+            chart_count += transform_level(src, chart_id, dest, transforms)
+
+    click.echo(f"{chart_count} charts written to {dest}.")
+
+
+@click.command("simulate")
+@click.argument("chart_ids", type=click.STRING, nargs=-1)
+@click.option("--src", "--in", "-s", "-i",
+              type=src_path_type, default=CHART_PATH,
+              help="Folder or zip/tar archive of all levels & charts")
+@click.option("--dest", "--out", "-d", "-o",
+              type=file_type, default=default_sim_path,
+              help="Path of the Excel file the simulated scores are saved to")
+@click.option("--model", "-m", "model_name",
+              type=click.Choice(sorted(ACCURACY_MODELS)), default="skilled",
+              help="Player accuracy model to simulate")
+@click.option("--model-file",
+              type=click.Path(exists=True, dir_okay=False), default=None,
+              help="JSON file with a custom accuracy model (overrides --model)")
+@click.option("--runs", "-n",
+              type=click.IntRange(min=1), default=DEFAULT_RUNS,
+              help="Number of simulated plays per chart")
+@click.option("--seed",
+              type=click.INT, default=None,
+              help="Seed for reproducible results")
+def simulate(chart_ids: List[str] = [], src: str = CHART_PATH,
+             dest: str = default_sim_path, model_name: str = "skilled",
+             model_file: Optional[str] = None, runs: int = DEFAULT_RUNS,
+             seed: Optional[int] = None):
+    """
+        Simulates plays of charts under a player accuracy model and saves the
+        expected score and TP with their percentiles. If you want to simulate
+        all levels in src, don't input any IDs.
+    """
+    if model_file is not None:
+        try:
+            with open(model_file, encoding="utf8") as json_file:
+                model = AccuracyModel.from_dict(json.load(json_file))
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {model_file}. Check that it "
+                f"has a judgements object with probabilities for "
+                f"every note group."
+            ) from err
+    else:
+        model = ACCURACY_MODELS[model_name]
+
+    if len(chart_ids) == 0:
+        chart_ids = refresh_catalog(src).level_ids()
+
+    if len(chart_ids) == 0:
+        click.echo("No charts in the folder!")
+
+    src = os.path.abspath(src)
+    dest = os.path.abspath(dest)
+
+    stat_list: Dict[str, dict] = dict()
+
+    def write_stats(chart_id: str, stats: dict):
+        stat_list[chart_id] = stats
+
+    pipeline = Pipeline(lambda chart_id: (chart_id,
+                                          load_note_types(src, chart_id)),
+                        lambda item: simulate_chart(*item, model, runs, seed),
+                        write_stats)
+    label = f"Simulating {len(chart_ids)} charts ({model.name}, {runs} runs)..."
+    with click.progressbar(pipeline.run(chart_ids),
+                           length=len(chart_ids),
+                           label=label,
+                           item_show_func=lambda x: x and x[0]) as prog_bar:
+        for _ in prog_bar:
+            pass
+
+    click.echo(f"Done simulating, now saving to {dest}...")
+    save_stats({cid: stat_list[cid] for cid in chart_ids}, dest)
+    click.echo("Simulated scores successfully saved.")
 
 
 cli.add_command(org_files)
 cli.add_command(analyze)
+cli.add_command(merge)
 cli.add_command(plot_dist)
+cli.add_command(export_dist)
+cli.add_command(build_index)
+cli.add_command(diff)
+cli.add_command(transform)
+cli.add_command(simulate)
 
 if __name__ == "__main__":
     if getattr(sys, 'frozen', False):
@@ -1 +1 @@
-from excel.excel_writer import ExcelWriter
\ No newline at end of file
+from excel.excel_writer import ExcelWriter, StreamingExcelWriter
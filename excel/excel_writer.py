@@ -1,11 +1,56 @@
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
 import pandas as pd
 import xlsxwriter as xw
 import xlsxwriter.worksheet as xws
+from xlsxwriter.utility import xl_range
 
 from .formats import FORMATS
 
 NO_AVG_COLS = ["chart_id", "title", "title_localized",
-               "artist", "illustrator", "charter", "diff"]
+               "artist", "illustrator", "charter", "diff", "model"]
+WINDOW_REGEX = re.compile(r'(\d)S\b')
+TABLE_STYLE = "Table Style Medium 6"
+
+
+def _add_formats(workbook: xw.Workbook) -> Tuple[dict, Any]:
+    formats = dict()
+    for name, format_ in FORMATS.items():
+        cell_format = workbook.add_format(format_["format"])
+        cell_format.set_align("vcenter")
+        formats[name] = {"keywords": format_["keywords"],
+                         "format": cell_format}
+
+    return formats, workbook.add_format({"align": "vcenter"})
+
+
+def _column_options(header: str, formats: dict,
+                    default_format) -> Tuple[dict, Any]:
+    """
+        Returns the table column options for a stat and the cell format of
+        its whole column.
+    """
+    col_opts = dict()
+    col_opts["header"] = ExcelWriter._format_header_name(header)
+
+    if header == "chart_id":
+        col_opts["total_string"] = "Average"
+
+    if header not in NO_AVG_COLS:
+        col_opts["total_function"] = "average"
+        col_opts["format"] = formats["decimal"]["format"]
+    else:
+        col_opts["format"] = default_format
+
+    for format_ in formats.values():
+        if any([header.endswith(kw) for kw in format_["keywords"]]):
+            col_opts["format"] = format_["format"]
+            return col_opts, format_["format"]
+
+    return col_opts, default_format
+
 
 class ExcelWriter:
     df: pd.DataFrame
@@ -23,13 +68,7 @@ class ExcelWriter:
         self.sheet = self.writer.sheets["Chart Stats"]
         self.sheet.freeze_panes(1, 1)
 
-        self.formats = FORMATS
-
-        for format_ in self.formats.values():
-            format_["format"] = self.workbook.add_format(format_["format"])
-            format_["format"].set_align("vcenter")
-
-        self.default_format = self.workbook.add_format({"align": "vcenter"})
+        self.formats, self.default_format = _add_formats(self.workbook)
 
     def format_table(self):
         col_opts_list = []
@@ -37,32 +76,14 @@ class ExcelWriter:
         cols.insert(0, self.df.index.name)
 
         for idx, header in enumerate(cols):
-            col_opts = dict()
-            col_opts["header"] = self._format_header_name(header)
-
-            if header == "chart_id":
-                col_opts["total_string"] = "Average"
-
-            if header not in NO_AVG_COLS:
-                col_opts["total_function"] = "average"
-                col_opts["format"] = self.formats["decimal"]["format"]
-            else:
-                col_opts["format"] = self.default_format
-
-            for format_ in self.formats.values():
-                if any([header.endswith(kw) for kw in format_["keywords"]]):
-                    self.sheet.set_column(idx, idx,
-                                          cell_format=format_["format"])
-                    col_opts["format"] = format_["format"]
-                    break
-            else:
-                self.sheet.set_column(idx, idx, cell_format=self.default_format)
-
+            col_opts, col_format = _column_options(header, self.formats,
+                                                   self.default_format)
+            self.sheet.set_column(idx, idx, cell_format=col_format)
             col_opts_list.append(col_opts)
 
         table_opts = {
             "first_column": True,
-            "style": "Table Style Medium 6",
+            "style": TABLE_STYLE,
             "name": "ChartStats",
             "total_row": True,
             "columns": col_opts_list,
@@ -80,6 +101,7 @@ class ExcelWriter:
         dot_words = ["Min", "Max", "Sec", "Avg", "Diff"]
         key = key.replace("_", " ")
         key = key.title()
+        key = WINDOW_REGEX.sub(r'\1s', key)
         for word in capitalize_words:
             key = key.replace(word, word.upper())
 
@@ -91,3 +113,73 @@ class ExcelWriter:
         key = key.replace("Localized", "(Localized)")
 
         return key
+
+
+class StreamingExcelWriter:
+    """
+        Writes the chart stats one row at a time in xlsxwriter's
+        constant_memory mode, so rows are flushed to disk as they come in
+        instead of being held as a DataFrame. The columns are taken from the
+        first row. Tables aren't supported in this mode, so the header gets
+        an autofilter and the averages are written as plain formulas.
+    """
+    workbook: xw.Workbook
+    sheet: xws.Worksheet
+    columns: Optional[List[str]]
+
+    def __init__(self, path: str):
+        self.workbook = xw.Workbook(path, {"constant_memory": True})
+        self.sheet = self.workbook.add_worksheet("Chart Stats")
+        self.sheet.freeze_panes(1, 1)
+
+        self.formats, self.default_format = _add_formats(self.workbook)
+        self.header_format = self.workbook.add_format({"bold": True,
+                                                       "align": "vcenter"})
+        self.columns = None
+        self.col_opts: List[dict] = []
+        self.row_count = 0
+
+    def write_row(self, chart_id: str, stats: Dict[str, Any]):
+        if self.columns is None:
+            self._write_header(list(stats.keys()))
+
+        self.row_count += 1
+        self.sheet.write(self.row_count, 0, chart_id)
+        for idx, col in enumerate(self.columns, 1):
+            value = stats.get(col)
+            # Excel has no NaN or infinity, so those are left blank like
+            # missing stats.
+            if value is None or (isinstance(value, float)
+                                 and not math.isfinite(value)):
+                continue
+            self.sheet.write(self.row_count, idx, value)
+
+    def _write_header(self, columns: List[str]):
+        self.columns = columns
+        for idx, header in enumerate(["chart_id"] + columns):
+            col_opts, col_format = _column_options(header, self.formats,
+                                                   self.default_format)
+            self.sheet.set_column(idx, idx, cell_format=col_format)
+            self.sheet.write(0, idx, col_opts["header"], self.header_format)
+            self.col_opts.append(col_opts)
+
+    def close(self):
+        if self.columns is None:
+            self._write_header([])
+
+        last_row = self.row_count
+        self.sheet.autofilter(0, 0, last_row, len(self.col_opts) - 1)
+
+        if last_row > 0:
+            total_row = last_row + 1
+            for idx, col_opts in enumerate(self.col_opts):
+                if "total_string" in col_opts:
+                    self.sheet.write(total_row, idx, col_opts["total_string"],
+                                     self.header_format)
+                elif "total_function" in col_opts:
+                    cells = xl_range(1, idx, last_row, idx)
+                    self.sheet.write_formula(total_row, idx,
+                                             f"=SUBTOTAL(101,{cells})",
+                                             col_opts["format"])
+
+        self.workbook.close()
@@ -1,12 +1,14 @@
 import json
 import os
 import re
-import shutil
 import time
 from dataclasses import InitVar, dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+import bundle
+from batch import Journal
 from chart import LevelInfo
+from corpus import Catalog
 from .titles import ID_OVERRIDES, LOCALIZED_TITLES
 
 FIRST_CAP_REGEX = re.compile(r'(.)([A-Z][a-z]+)')
@@ -20,6 +22,8 @@ class Organizer:
     src: str
     dest: str
     force: bool
+    catalog: Optional[Catalog] = None
+    journal: Optional[Journal] = None
 
     def __post_init__(self):
         if not os.path.exists(self.dest):
@@ -31,8 +35,10 @@ class Organizer:
             self.src, "meta", "expansion_pack_data.json")
 
         try:
-            with open(song_pack_path, encoding="utf8") as song_pack_file, \
-                    open(ex_pack_path, encoding="utf8") as ex_pack_file:
+            with bundle.open_file(song_pack_path,
+                                  encoding="utf8") as song_pack_file, \
+                    bundle.open_file(ex_pack_path,
+                                     encoding="utf8") as ex_pack_file:
                 song_pack_data = json.load(song_pack_file)
                 ex_pack_data = json.load(ex_pack_file)
                 song_pack_file.close()
@@ -97,21 +103,41 @@ class Organizer:
         return ret
 
     def organize(self, song_info: dict, is_glitch: bool = False):
+        level_json = self.prepare(song_info, is_glitch)
+        if level_json is None:
+            self.num_of_charts["exist"] += 1
+            return
+
+        self.write_level(song_info, level_json, is_glitch)
+
+    def prepare(self, song_info: dict, is_glitch: bool = False) -> Optional[dict]:
+        """
+            Creates the song's folder and its level.json contents. Returns None
+            if the song is already organized (and force is off), going by the
+            journal and the catalog of dest if there are any. A song missing
+            from the journal is organized again, but files that were already
+            copied in full are kept.
+        """
         chart_id = self._create_chart_id(song_info, is_glitch)
         chart_folder = os.path.join(self.dest, chart_id)
         if not os.path.exists(chart_folder):
-            os.makedirs(chart_folder)
+            os.makedirs(chart_folder, exist_ok=True)
 
         level_json_path = os.path.join(self.dest, chart_id, "level.json")
 
-        if not self.force:
+        if self.force or (self.journal is not None
+                          and not self.journal.is_done(chart_id)):
+            pass
+        elif self.catalog is not None:
+            if self.catalog.is_valid(chart_id):
+                return None
+        else:
             try:
                 with open(level_json_path, encoding="utf8") as level_json_file:
                     level_info = LevelInfo.from_dict(json.load(level_json_file), self.dest) 
 
                     if level_info.are_paths_valid():
-                        self.num_of_charts["exist"] += 1
-                        return
+                        return None
                     else:
                         raise OSError(
                             "One of the paths in the level.json is invalid"
@@ -119,8 +145,11 @@ class Organizer:
             except Exception:
                 pass
 
-        level_json = self._create_level_json(song_info, chart_id, is_glitch)
+        return self._create_level_json(song_info, chart_id, is_glitch)
+
+    def write_level(self, song_info: dict, level_json: dict, is_glitch: bool = False):
         level_info = LevelInfo.from_dict(level_json, self.dest)
+        level_json_path = os.path.join(self.dest, level_json["id"], "level.json")
         try:
             self._copy_chart_files(song_info["song_id"], level_info)
         except OSError as err:
@@ -129,9 +158,15 @@ class Organizer:
                 f"\"{level_json['title']}\". Aborting organization..."
             ) from err
 
-        with open(level_json_path, "w", encoding="utf8") as level_json_file:
+        # The level.json goes in last, so it never points at missing files.
+        tmp_path = f"{level_json_path}.part"
+        with open(tmp_path, "w", encoding="utf8") as level_json_file:
             json.dump(level_json, level_json_file, indent=4)
-        
+        os.replace(tmp_path, level_json_path)
+
+        if self.journal is not None:
+            self.journal.record_done(level_json["id"])
+
         if is_glitch:
             self.num_of_charts["success_glitch"] += 1
         else:
@@ -212,10 +247,28 @@ class Organizer:
                     orig_fname = f"{old_id}_{diff_idx}.{ext}"
                     orig_path = os.path.join(
                         self.src, subfolder, orig_fname)
-                    shutil.copy2(orig_path, inner_path)
+                    self._copy_file(orig_path, inner_path)
             elif item == "background":
                 orig_path = os.path.join(self.src, item, f"{old_id}.png")
-                shutil.copy2(orig_path, path)
+                self._copy_file(orig_path, path)
             elif item == "music" or item == "music_preview":
                 orig_path = os.path.join(self.src, item, f"{old_id}.ogg")
-                shutil.copy2(orig_path, path)
+                self._copy_file(orig_path, path)
+
+    def _copy_file(self, orig_path: str, path: str):
+        """
+            Copies to a temporary file first and renames it into place, so an
+            interrupted copy never leaves a cut off file behind. Files that
+            already match the original's size and modification time are
+            skipped unless force is on.
+        """
+        orig_stat = bundle.stat(orig_path)
+        if not self.force and os.path.exists(path):
+            stat = os.stat(path)
+            if stat.st_size == orig_stat.st_size and \
+                    int(stat.st_mtime) == int(orig_stat.st_mtime):
+                return
+
+        tmp_path = f"{path}.part"
+        bundle.copy_file(orig_path, tmp_path)
+        os.replace(tmp_path, path)
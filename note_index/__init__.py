@@ -0,0 +1,2 @@
+from .builder import build_index
+from .query import NoteIndex
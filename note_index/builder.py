@@ -0,0 +1,119 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+import bundle
+from chart import Chart, LevelInfo, NoteColumns, PageColumns, TempoMap
+
+NOTE_COLUMNS = ["chart", "tick", "sec", "end_sec", "note_type", "x",
+                "hold_tick", "page_index", "note_id", "next_id"]
+PAGE_COLUMNS = ["chart", "start_tick", "end_tick", "scan_line_direction",
+                "start_sec", "end_sec"]
+TEMPO_COLUMNS = ["chart", "tick", "value", "sec"]
+TABLES = {
+    "notes": NOTE_COLUMNS,
+    "pages": PAGE_COLUMNS,
+    "tempos": TEMPO_COLUMNS,
+}
+
+
+def build_index(folder: str, chart_ids: List[str], dest: str) -> int:
+    """
+        Packs the notes, pages and tempos of every chart into one columnar
+        store at dest. Each column is saved as its own .npy file so that
+        NoteIndex can memory-map them, and charts.json holds the chart-offset
+        table for every table. Returns the number of indexed notes.
+    """
+    os.makedirs(dest, exist_ok=True)
+    columns: Dict[str, Dict[str, list]] = {
+        table: {col: [] for col in cols} for table, cols in TABLES.items()
+    }
+    offsets: Dict[str, List[int]] = {table: [0] for table in TABLES}
+    charts = []
+
+    for chart_idx, chart_id in enumerate(chart_ids):
+        level_info, chart = _load_chart(folder, chart_id)
+        chart_info = level_info.charts[-1]
+        tempo_map = TempoMap.from_chart(chart)
+
+        notes = NoteColumns.from_chart(chart)
+        note_secs = tempo_map.to_sec(notes.tick)
+        note_end_secs = tempo_map.to_sec(notes.tick + notes.hold_tick)
+        order = np.argsort(note_secs, kind="stable")
+        table = {
+            "tick": notes.tick, "sec": note_secs, "end_sec": note_end_secs,
+            "note_type": notes.note_type, "x": notes.x.astype(np.float32),
+            "hold_tick": notes.hold_tick, "page_index": notes.page_index,
+            "note_id": notes.note_id, "next_id": notes.next_id,
+        }
+        _append_table(columns["notes"], offsets["notes"], chart_idx,
+                      {col: arr[order] for col, arr in table.items()})
+
+        pages = PageColumns.from_chart(chart)
+        _append_table(columns["pages"], offsets["pages"], chart_idx, {
+            "start_tick": pages.start_tick, "end_tick": pages.end_tick,
+            "scan_line_direction": pages.scan_line_direction,
+            "start_sec": tempo_map.to_sec(pages.start_tick),
+            "end_sec": tempo_map.to_sec(pages.end_tick),
+        })
+
+        tempos = tempo_map.tempos
+        _append_table(columns["tempos"], offsets["tempos"], chart_idx, {
+            "tick": tempos.tick, "value": tempos.value,
+            "sec": tempo_map.start_us / 1e6,
+        })
+
+        charts.append({
+            "chart_id": chart_id,
+            "diff": chart_info.name,
+            "level": chart_info.difficulty,
+            "time_base": chart.time_base,
+        })
+
+    for table, cols in columns.items():
+        for col, arrs in cols.items():
+            arr = np.concatenate(arrs) if arrs else np.zeros(0)
+            np.save(os.path.join(dest, f"{table}.{col}.npy"), arr)
+
+    with open(os.path.join(dest, "charts.json"), "w",
+              encoding="utf8") as charts_file:
+        json.dump({"charts": charts, "offsets": offsets}, charts_file)
+
+    return offsets["notes"][-1]
+
+
+def _append_table(columns: Dict[str, list], offsets: List[int],
+                  chart_idx: int, table: Dict[str, np.ndarray]):
+    length = len(next(iter(table.values())))
+    columns["chart"].append(np.full(length, chart_idx, dtype=np.int32))
+    for col, arr in table.items():
+        columns[col].append(arr)
+    offsets.append(offsets[-1] + length)
+
+
+def _load_chart(folder: str, chart_id: str):
+    level_json_path = os.path.join(folder, chart_id, "level.json")
+    try:
+        with bundle.open_file(level_json_path,
+                              encoding="utf8") as level_json_file:
+            level_info = LevelInfo.from_dict(json.load(level_json_file),
+                                             folder)
+    except Exception as err:
+        raise Exception(
+            f"There's something wrong with {chart_id}'s level.json"
+        ) from err
+
+    chart_info = level_info.charts[-1]
+    try:
+        chart_path = level_info.paths["charts"][chart_info.name]
+        with bundle.open_file(chart_path, encoding="utf8") as chart_file:
+            chart = Chart.from_dict(json.load(chart_file))
+    except Exception as err:
+        raise Exception(
+            f"There's something wrong with {chart_id}'s "
+            f"{chart_info.name} chart."
+        ) from err
+
+    return level_info, chart
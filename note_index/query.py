@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from analysis.density import window_counts
+from chart import NoteType
+
+from .builder import TABLES
+
+
+class NoteIndex:
+    """
+        Read-only view over a store written by build_index. Columns are
+        memory-mapped on first access, so queries only page in the columns
+        they actually touch.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "charts.json"),
+                  encoding="utf8") as charts_file:
+            meta = json.load(charts_file)
+
+        self.charts: List[dict] = meta["charts"]
+        self.chart_ids: List[str] = [c["chart_id"] for c in self.charts]
+        self.chart_idxs: Dict[str, int] = {
+            chart_id: idx for idx, chart_id in enumerate(self.chart_ids)
+        }
+        self.offsets: Dict[str, np.ndarray] = {
+            table: np.array(offsets) for table, offsets in meta["offsets"].items()
+        }
+        self._columns: Dict[Tuple[str, str], np.ndarray] = dict()
+
+    def __len__(self) -> int:
+        return len(self.chart_ids)
+
+    def column(self, table: str, col: str) -> np.ndarray:
+        if col not in TABLES[table]:
+            raise KeyError(f"{table} has no column named {col}")
+
+        key = (table, col)
+        if key not in self._columns:
+            col_path = os.path.join(self.path, f"{table}.{col}.npy")
+            self._columns[key] = np.load(col_path, mmap_mode="r")
+
+        return self._columns[key]
+
+    def chart_table(self, chart_id: str, table: str = "notes") -> Dict[str, np.ndarray]:
+        chart_idx = self.chart_idxs[chart_id]
+        start, end = self.offsets[table][chart_idx:chart_idx + 2]
+        return {col: self.column(table, col)[start:end]
+                for col in TABLES[table] if col != "chart"}
+
+    def peak_window_counts(self, window: float) -> np.ndarray:
+        """
+            Returns the most notes touching any window-second span of each
+            chart, with holds counted in every span they touch like
+            Analyzer's peak note rates. Notes are stored sorted by second
+            within each chart, so offsetting every chart by a stride longer
+            than any song turns the whole corpus into one sorted array, and
+            the spans starting on each note's end are counted with
+            window_counts.
+        """
+        secs = np.asarray(self.column("notes", "sec"))
+        end_secs = np.asarray(self.column("notes", "end_sec"))
+        chart = np.asarray(self.column("notes", "chart"))
+        peaks = np.zeros(len(self), dtype=np.int64)
+        if len(secs) == 0:
+            return peaks
+
+        stride = end_secs.max() + window + 1
+        counts = window_counts(chart * stride + secs, window,
+                               chart * stride + end_secs)
+
+        starts = self.offsets["notes"][:-1]
+        non_empty = starts < self.offsets["notes"][1:]
+        peaks[non_empty] = np.maximum.reduceat(counts, starts[non_empty])
+        return peaks
+
+    def dense_charts(self, window: float, min_notes: int) -> List[Tuple[str, int]]:
+        """
+            Lists every chart where any window-second span has more than
+            min_notes notes, with its peak count.
+        """
+        peaks = self.peak_window_counts(window)
+        return [(self.chart_ids[idx], int(peaks[idx]))
+                for idx in np.flatnonzero(peaks > min_notes)]
+
+    def long_notes(self, min_sec: float,
+                   note_types: Iterable[NoteType] = (NoteType.long_hold,)
+                   ) -> List[Tuple[str, int, float]]:
+        """
+            Lists (chart_id, note_id, duration) of every note of the given
+            types that lasts longer than min_sec seconds.
+        """
+        codes = [nt.value for nt in note_types]
+        durations = np.asarray(self.column("notes", "end_sec")) \
+            - np.asarray(self.column("notes", "sec"))
+        mask = np.isin(self.column("notes", "note_type"), codes) \
+            & (durations > min_sec)
+
+        chart = self.column("notes", "chart")[mask]
+        note_id = self.column("notes", "note_id")[mask]
+        return [(self.chart_ids[c], int(nid), round(float(dur), 3))
+                for c, nid, dur in zip(chart, note_id, durations[mask])]
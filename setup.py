@@ -5,7 +5,7 @@ setup(
     version='0.1',
     py_modules=['cli'],
     install_requires=[
-        'Click', 'mutagen', 'pandas', 'xlrd', 'XlsxWriter'
+        'Click', 'mutagen', 'numpy', 'pandas', 'xlrd', 'XlsxWriter'
     ],
     entry_points='''
         [console_scripts]
@@ -0,0 +1,2 @@
+from .transforms import change_rate, mirror, shift_offset, thin, transform_chart
+from .writer import transform_level
@@ -0,0 +1,86 @@
+from typing import Callable, Iterable
+
+import numpy as np
+
+from chart import ChartColumns, NoteColumns, NoteType, TempoColumns
+
+Transform = Callable[[ChartColumns], ChartColumns]
+THINNABLE_NOTES = [NoteType.tap, NoteType.hold, NoteType.long_hold,
+                   NoteType.flick]
+
+
+def mirror(chart: ChartColumns) -> ChartColumns:
+    """
+        Flips every note horizontally.
+    """
+    notes = chart.notes
+    mirrored = NoteColumns(**{**vars(notes), "x": np.round(1 - notes.x, 6)})
+    return chart.copy(notes=mirrored)
+
+
+def change_rate(rate: float) -> Transform:
+    """
+        Speeds the chart up (rate > 1) or slows it down (rate < 1) by scaling
+        every tempo. The audio isn't touched, so it has to be resampled
+        separately for the chart to stay in sync.
+    """
+    def _change_rate(chart: ChartColumns) -> ChartColumns:
+        tempos = TempoColumns(
+            chart.tempos.tick,
+            np.round(chart.tempos.value / rate).astype(np.int64))
+        return chart.copy(tempos=tempos,
+                          start_offset_time=chart.start_offset_time / rate)
+
+    return _change_rate
+
+
+def shift_offset(secs: float) -> Transform:
+    """
+        Moves the whole chart secs seconds later (or earlier if negative).
+    """
+    def _shift_offset(chart: ChartColumns) -> ChartColumns:
+        return chart.copy(start_offset_time=chart.start_offset_time + secs)
+
+    return _shift_offset
+
+
+def thin(ratio: float) -> Transform:
+    """
+        Keeps roughly ratio of the taps, holds and flicks, picked evenly
+        across the chart. Drag chains are always kept whole. Note IDs are
+        renumbered and every next_id is remapped to match.
+    """
+    def _thin(chart: ChartColumns) -> ChartColumns:
+        notes = chart.notes
+        thinnable = np.isin(notes.note_type,
+                            [nt.value for nt in THINNABLE_NOTES])
+        order = np.cumsum(thinnable) - 1
+        picked = np.floor((order + 1) * ratio) > np.floor(order * ratio)
+        keep = ~thinnable | picked
+
+        new_ids = np.full(int(notes.note_id.max(initial=-1)) + 1, -1,
+                          dtype=np.int32)
+        kept_ids = notes.note_id[keep]
+        new_ids[kept_ids] = np.arange(len(kept_ids), dtype=np.int32)
+
+        next_id = notes.next_id[keep]
+        linked = (next_id > 0) & (next_id < len(new_ids))
+        next_id = next_id.copy()
+        next_id[linked] = new_ids[next_id[linked]]
+
+        thinned = NoteColumns(**{
+            **{col: arr[keep] for col, arr in vars(notes).items()},
+            "note_id": np.arange(len(kept_ids), dtype=np.int32),
+            "next_id": next_id,
+        })
+        return chart.copy(notes=thinned)
+
+    return _thin
+
+
+def transform_chart(chart: ChartColumns,
+                    transforms: Iterable[Transform]) -> ChartColumns:
+    for transform in transforms:
+        chart = transform(chart)
+
+    return chart
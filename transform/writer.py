@@ -0,0 +1,69 @@
+import json
+import os
+from typing import Iterable
+
+import bundle
+from chart import ChartColumns, LevelInfo
+
+from .transforms import Transform, transform_chart
+
+
+def transform_level(src: str, chart_id: str, dest: str,
+                    transforms: Iterable[Transform]) -> int:
+    """
+        Writes a copy of a level to dest with every one of its charts
+        transformed. Audio and images are only copied if they aren't in dest
+        yet. Returns the number of charts written.
+    """
+    transforms = list(transforms)
+    level_json_path = os.path.join(src, chart_id, "level.json")
+    try:
+        with bundle.open_file(level_json_path,
+                              encoding="utf8") as level_json_file:
+            level_json = json.load(level_json_file)
+            level_info = LevelInfo.from_dict(level_json, src)
+    except Exception as err:
+        raise Exception(
+            f"There's something wrong with {chart_id}'s level.json"
+        ) from err
+
+    dest_info = LevelInfo.from_dict(level_json, dest)
+    os.makedirs(os.path.join(dest, chart_id), exist_ok=True)
+
+    for diff, chart_path in level_info.paths["charts"].items():
+        try:
+            with bundle.open_file(chart_path,
+                                  encoding="utf8") as chart_file:
+                chart = ChartColumns.from_dict(json.load(chart_file))
+        except Exception as err:
+            raise Exception(
+                f"There's something wrong with {chart_id}'s {diff} chart."
+            ) from err
+
+        chart = transform_chart(chart, transforms)
+        dest_path = dest_info.paths["charts"][diff]
+        # The level.json can point into subfolders of the level folder.
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        with open(dest_path, "w", encoding="utf8") as chart_file:
+            json.dump(chart.to_dict(), chart_file, separators=(",", ":"))
+
+    for item, path in level_info.paths.items():
+        if item == "charts":
+            continue
+
+        if item == "overrides":
+            pairs = [(inner_path, dest_info.paths[item][diff])
+                     for diff, inner_path in path.items()]
+        else:
+            pairs = [(path, dest_info.paths[item])]
+
+        for src_path, dest_path in pairs:
+            if not os.path.exists(dest_path):
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                bundle.copy_file(src_path, dest_path)
+
+    with open(os.path.join(dest, chart_id, "level.json"), "w",
+              encoding="utf8") as level_json_file:
+        json.dump(level_json, level_json_file, indent=4)
+
+    return len(level_info.paths["charts"])